@@ -1,16 +1,21 @@
 """
 AI 分析助手服务
 使用 DeepSeek API 提供智能分析和自然语言操控功能
+上游调用在专用线程池中执行 (submit_chat)，共用一个 keep-alive 连接池；并发数与排队数有上限，
+慢的 LLM 调用不会占满处理图表请求的线程
 """
 
 import os
 import json
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
 
-# DeepSeek API 配置
+import config
+
+# DeepSeek API 配置 (DEEPSEEK_API_URL 可指向本地模拟服务，见 test_ai.py)
 DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', 'sk-5a12767e3f694109a79da17f5499d880')
-DEEPSEEK_API_URL = 'https://api.deepseek.com/v1/chat/completions'
+DEEPSEEK_API_URL = os.getenv('DEEPSEEK_API_URL', 'https://api.deepseek.com/v1/chat/completions')
 
 # Function Calling 工具定义
 FUNCTIONS = [
@@ -58,6 +63,58 @@ FUNCTIONS = [
 ]
 
 
+class Saturated(Exception):
+    """正在调用与排队的 AI 请求数已达上限 (接口返回 429)"""
+
+
+class _Pool:
+    """线程池、HTTP 连接池与请求名额；按进程创建 (serve.py fork 出的工作进程不共用父进程的连接与线程)"""
+
+    def __init__(self):
+        import requests  # 延迟导入：只有 AI 对话需要，避免拖慢 API 进程启动
+        from requests.adapters import HTTPAdapter
+
+        self.pid = os.getpid()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.AI_MAX_CONCURRENCY)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = ThreadPoolExecutor(config.AI_MAX_CONCURRENCY, thread_name_prefix="ai-chat")
+        self.slots = threading.BoundedSemaphore(config.AI_MAX_CONCURRENCY + config.AI_MAX_QUEUE)
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    pool = _pool
+    if pool is None or pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = _Pool()
+            pool = _pool
+    return pool
+
+
+def submit_chat(message: str, context: Dict[str, Any]):
+    """
+    在 AI 线程池中执行 chat_with_ai，返回 Future
+    正在执行与排队的请求已达 AI_MAX_CONCURRENCY + AI_MAX_QUEUE 时立即抛出 Saturated，不排队等待
+    """
+    pool = _get_pool()
+    if not pool.slots.acquire(blocking=False):
+        raise Saturated()
+    try:
+        future = pool.executor.submit(chat_with_ai, message, context)
+    except BaseException:
+        pool.slots.release()
+        raise
+    future.add_done_callback(lambda _: pool.slots.release())
+    return future
+
+
 def build_system_prompt(context: Dict[str, Any]) -> str:
     """构建系统提示词"""
     prompt = """你是一个数据筛选助手，专门帮助用户筛选9月份的套利信号数据。
@@ -179,6 +236,8 @@ def chat_with_ai(message: str, context: Dict[str, Any]) -> Dict[str, Any]:
             } 或 None
         }
     """
+    import requests  # 延迟导入：只有 AI 对话需要，避免拖慢 API 进程启动
+
     try:
         system_prompt = build_system_prompt(context)
         
@@ -203,11 +262,11 @@ def chat_with_ai(message: str, context: Dict[str, Any]) -> Dict[str, Any]:
             "max_tokens": 2000
         }
         
-        response = requests.post(
+        response = _get_pool().session.post(
             DEEPSEEK_API_URL,
             headers=headers,
             json=payload,
-            timeout=30
+            timeout=(config.AI_CONNECT_TIMEOUT_SECONDS, config.AI_READ_TIMEOUT_SECONDS)
         )
         
         if response.status_code != 200:
@@ -1,8 +1,22 @@
-from flask import Flask, jsonify, request, session
+import concurrent.futures
+import functools
+import itertools
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from flask import Flask, Response, g, jsonify, make_response, request, session
 from flask_cors import CORS
 from datetime import datetime
 import config
-import service
+import arrow_export
+import http_cache
+import metrics
+import tracing
+from profiler import profiler
 import ai_service
 import auth
 
@@ -10,6 +24,160 @@ app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'  # 生产环境请更改此密钥
 CORS(app, supports_credentials=True)
 
+log = metrics.get_logger("api")
+
+# ==========================================
+# 请求监控：每个路由的请求数、错误数、耗时与响应大小 (GET /metrics)
+# ==========================================
+# getdata / getresult 按 type 参数区分，未知取值归为 other，避免标签取值无限增长
+_REQUEST_TYPES = {
+    "/app/getdata": ("price", "spread", "heatmap", "correlation"),
+    "/app/getresult": ("backtest", "signals", "sweep"),
+}
+_METRIC_LABELS = ("route", "method", "type")
+REQUESTS = metrics.Counter("api_requests_total", "HTTP requests by route and status",
+                           _METRIC_LABELS + ("status",))
+ERRORS = metrics.Counter("api_request_errors_total", "HTTP requests answered with a 5xx status",
+                         _METRIC_LABELS)
+LATENCY = metrics.Histogram("api_request_duration_seconds",
+                            "Time from request start until the response body was fully sent",
+                            _METRIC_LABELS, config.METRICS_LATENCY_BUCKETS)
+RESPONSE_SIZE = metrics.Histogram("api_response_size_bytes", "Response body size as sent (after compression)",
+                                  _METRIC_LABELS, config.METRICS_SIZE_BUCKETS)
+
+def _request_labels():
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    kind = ""
+    types = _REQUEST_TYPES.get(route)
+    if types is not None:
+        kind = request.args.get("type", types[0])
+        if kind not in types:
+            kind = "other"
+    return route, request.method, kind
+
+def _record_request(labels, status, size, started, fields, trace):
+    elapsed = time.perf_counter() - started
+    REQUESTS.inc(labels + (str(status),))
+    if status >= 500:
+        ERRORS.inc(labels)
+    LATENCY.observe(labels, elapsed)
+    RESPONSE_SIZE.observe(labels, size)
+    tracing.end_trace(trace, **{"http.status_code": status, "http.response.body.size": size})
+    if config.REQUEST_LOG:
+        metrics.log_event(log, "request", {**fields, "status": status, "bytes": size,
+                                           "ms": round(elapsed * 1000, 2),
+                                           "trace": trace.trace.trace_id if trace else None})
+
+def _measured(chunks, labels, status, started, fields, trace):
+    """流式响应在最后一块发送完 (或客户端断开) 时才记录耗时与大小"""
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        _record_request(labels, status, size, started, fields, trace)
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+    g.labels = _request_labels()
+    route, method, kind = g.labels
+    g.trace = tracing.start_trace(f"{method} {route}", **{
+        "http.request.method": method, "http.route": route, "url.query": request.query_string.decode(errors="replace"),
+        "request.type": kind or None})
+
+@app.after_request
+def _instrument(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    labels = g.labels
+    # 流式响应在请求上下文结束后才发送，这里先取出日志字段
+    fields = {"method": request.method, "route": labels[0], "path": request.path,
+              "query": request.query_string.decode(errors="replace")}
+    if response.is_streamed:
+        response.response = _measured(response.response, labels, response.status_code, started, fields, g.trace)
+    else:
+        _record_request(labels, response.status_code, response.calculate_content_length() or 0,
+                        started, fields, g.trace)
+    return response
+
+def _json(data):
+    """jsonify 并记录序列化耗时与响应体大小"""
+    with tracing.span("serialize", format="json") as s:
+        response = jsonify(data)
+        s.set(bytes=response.content_length)
+    return response
+
+def _collect_service_metrics():
+    """结果缓存与数据快照的状态 (service 尚未导入时没有这些指标)"""
+    service = sys.modules.get("service")
+    if service is None:
+        return []
+    cache = service.result_cache.stats()
+    samples = [
+        ("api_result_cache_lookups_total", "counter", "Result cache lookups by outcome",
+         [({"result": r}, cache[r]) for r in ("hits", "misses", "coalesced")]),
+        ("api_result_cache_evictions_total", "counter", "Result cache evictions", [({}, cache["evictions"])]),
+        ("api_result_cache_entries", "gauge", "Entries in the result cache", [({}, cache["entries"])]),
+        ("api_result_cache_bytes", "gauge", "Estimated size of the result cache", [({}, cache["bytes"])]),
+        ("api_result_cache_hit_ratio", "gauge", "Share of lookups served without computing (hits + coalesced)",
+         [({}, cache["hitRate"])]),
+    ]
+    status = service.data_loader.status()
+    samples.append(("api_data_ready", "gauge", "1 once the first data snapshot is loaded",
+                    [({}, int(status["ready"]))]))
+    if status["ready"]:
+        samples += [
+            ("api_data_version", "gauge", "Version of the current data snapshot", [({}, status["version"])]),
+            ("api_data_rows", "gauge", "Rows in the current data snapshot",
+             [({"table": "data"}, status["dataRows"]), ({"table": "signals"}, status["signalRows"])]),
+            ("api_data_memory_bytes", "gauge", "Memory used by the current data snapshot",
+             [({"table": t}, n) for t, n in status["memory"].items() if t != "total"]),
+        ]
+    return samples
+
+metrics.register_collector(_collect_service_metrics)
+
+# ==========================================
+# 按需采样分析 (profiler.py)
+# ==========================================
+def _profiled(chunks, session):
+    """流式响应的内容在发送时才生成，发送完后再结束采样"""
+    try:
+        yield from chunks
+    finally:
+        profiler.stop(session)
+
+@app.before_request
+def _start_profile():
+    # 关闭时只有 should_profile 中的两次判断；请求头只对管理员生效
+    # 抽样 (sampleEvery / next) 只针对数据接口，匿名的登录、管理等请求不会占用预设的名额
+    # 文件名标签使用白名单中的 type (见 _REQUEST_TYPES)，不使用原始参数
+    route, _, kind = g.labels
+    if ((route in _REQUEST_TYPES and profiler.should_profile())
+            or (config.PROFILE_HEADER in request.headers and _is_admin())):
+        g.profile = profiler.start(request.endpoint or "unmatched", kind)
+
+@app.after_request
+def _stop_profile(response):
+    session = g.pop("profile", None)
+    if session is None:
+        return response
+    if response.is_streamed:
+        response.response = _profiled(response.response, session)
+    else:
+        path = profiler.stop(session)
+        if path:
+            response.headers["X-Profile-File"] = path
+    return response
+
+def quiet_server_log():
+    """开启 REQUEST_LOG 时关闭 werkzeug 开发服务器逐请求的同步访问日志"""
+    if config.REQUEST_LOG:
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
 def _get_default_dates():
     """
     辅助函数：将 config 中的日期字符串转换为时间戳 (秒)
@@ -26,87 +194,322 @@ def _get_default_dates():
         print(f"Config Date Parse Error: {e}")
         return 0, 0
 
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+
+def _service():
+    """延迟导入 service：pandas / numpy 与数据在第一次需要时才加载，API 进程可以立即启动"""
+    import service
+    return service
+
+def _start_warm_up(watch=False):
+    """在后台线程导入 service 并装载数据 (只启动一次)"""
+    global _warm_up_thread
+
+    def warm_up():
+        loader = _service().data_loader
+        loader.start_background_load()
+        if watch:
+            loader.start_watcher()
+
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _warm_up_thread.start()
+
+def _data_ready():
+    service = sys.modules.get("service")
+    # 后台线程导入 service 期间模块已在 sys.modules 中，但 data_loader 尚未创建
+    loader = getattr(service, "data_loader", None)
+    return loader is not None and loader.ready
+
+def _not_ready_response():
+    """数据尚未就绪时返回 503 并触发后台装载，客户端按 Retry-After 重试"""
+    _start_warm_up()
+    response = jsonify({"error": "数据正在加载，请稍后重试"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(config.STARTUP_RETRY_AFTER_SECONDS)
+    return response
+
+def _wants_arrow():
+    """Accept 头优先选择 Arrow IPC 流 (同等优先级时仍返回 JSON)"""
+    best = request.accept_mimetypes.best_match(["application/json", arrow_export.MIME_TYPE])
+    return best == arrow_export.MIME_TYPE
+
+def _arrow_response(columns, metadata=None):
+    if not arrow_export.available():
+        return jsonify({"error": "Arrow 输出需要安装 pyarrow"}), 406
+    with tracing.span("serialize", format="arrow"):
+        body = arrow_export.stream(columns, metadata)
+    return Response(body, mimetype=arrow_export.MIME_TYPE)
+
+def _parse_float(raw, name, positive=False):
+    """有限浮点数参数 (positive=True 时须大于 0)，不符合时抛出 ValueError (接口返回 400)"""
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number") from None
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    if positive and value <= 0:
+        raise ValueError(f"{name} must be greater than 0")
+    return value
+
+def _get_float_list(name, default, positive=False):
+    """
+    解析逗号分隔的数值列表参数，如 zThresholds=1,1.5,2
+    无法解析、为空或超过 SWEEP_MAX_GRID 个值时抛出 ValueError (接口返回 400)
+    """
+    raw = request.args.get(name)
+    if raw is None:
+        return list(default)
+    items = [x for x in raw.split(',') if x.strip()]
+    if not 1 <= len(items) <= config.SWEEP_MAX_GRID:
+        raise ValueError(f"{name} must have 1-{config.SWEEP_MAX_GRID} values")
+    return [_parse_float(x, name, positive) for x in items]
+
+def _conditional(view):
+    """
+    数据接口的 HTTP 缓存：就绪检查、ETag / 304、Cache-Control 与响应压缩
+    ETag 只依赖数据指纹与请求参数，If-None-Match 命中时不执行查询
+    """
+    @functools.wraps(view)
+    def wrapper():
+        if not _data_ready():
+            return _not_ready_response()
+        # ETag 与响应体来自同一个快照 (请求期间数据被替换时不会用旧 ETag 标记新数据)
+        with sys.modules["service"].data_loader.pinned() as snap:
+            representation = "arrow" if _wants_arrow() else "json"
+            etag = http_cache.make_etag(snap.fingerprint, request.path, request.args.items(multi=True),
+                                        representation)
+            end = request.args.get('end', type=int)
+            headers = {
+                "Cache-Control": http_cache.cache_control(_get_default_dates()[1] if end is None else end),
+                "Vary": "Accept, Accept-Encoding",
+            }
+
+            matched = http_cache.matching_etag(request.if_none_match, etag)
+            if matched is not None:
+                response = Response(status=304, headers=headers)
+                response.set_etag(matched)
+                return response
+
+            response = make_response(view())
+            if response.status_code != 200:
+                return response
+            encoding = http_cache.choose_encoding(request.accept_encodings)
+            if encoding and response.is_streamed:
+                response.response = http_cache.compress_stream(response.response, encoding)
+            elif encoding and response.content_length >= config.COMPRESS_MIN_BYTES:
+                with tracing.span("compress", encoding=encoding, bytes=response.content_length) as s:
+                    response.set_data(http_cache.compress(response.get_data(), encoding))
+                    s.set(compressed_bytes=response.content_length)
+            else:
+                encoding = None
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+                etag = f"{etag}-{encoding}"
+            response.headers.update(headers)
+            response.set_etag(etag)
+            return response
+    return wrapper
+
 @app.route("/app/getdata", methods=["GET"])
+@_conditional
 def getdata():
     """
     获取图表可视化数据
     Type: price | spread | heatmap | correlation
-    Params: start, end, type, interval
+    Params: start, end, type, interval, downsample (m4|lttb|stride), width
+            format: rows (默认，逐点对象) | columnar (各字段并列数组，体积更小、序列化更快)
+            heatmap: metric (spread|count|profit)
+            correlation: maxLag (分钟，默认见 Config)
     """
     try:
-        default_start, default_end = _get_default_dates()
-        
-        # 1. 解析参数 (优先使用 URL 参数，否则使用 Config 转换后的时间戳)
-        start = request.args.get('start', type=int)
-        if start is None: start = default_start
-            
-        end = request.args.get('end', type=int)
-        if end is None: end = default_end
-            
-        data_type = request.args.get('type', 'price')
-        interval = request.args.get('interval', '15m')
-        
-        print(f"API Request: getdata type={data_type}, range={start}-{end}")
+        service = _service()
+        with tracing.span("parse_params"):
+            default_start, default_end = _get_default_dates()
+
+            # 1. 解析参数 (优先使用 URL 参数，否则使用 Config 转换后的时间戳)
+            start = request.args.get('start', type=int)
+            if start is None: start = default_start
+
+            end = request.args.get('end', type=int)
+            if end is None: end = default_end
+
+            data_type = request.args.get('type', 'price')
+            interval = request.args.get('interval', '15m')
+            method = request.args.get('downsample', 'm4')
+            width = request.args.get('width', type=int)
+            if method not in service.DOWNSAMPLE_METHODS:
+                return jsonify({"error": "Unknown downsample method"}), 400
+            if width is not None and width <= 0:
+                return jsonify({"error": "width must be positive"}), 400
+            fmt = request.args.get('format', 'rows')
+            if fmt not in service.RESPONSE_FORMATS:
+                return jsonify({"error": "Unknown format"}), 400
 
         # 2. 调用 service 层的函数
+        arrow = _wants_arrow()
+        if arrow:
+            fmt = 'columnar'
+        if arrow and data_type in ('price', 'spread'):
+            return _arrow_response(service.get_chart_columns(start, end, interval, data_type))
         if data_type == 'price':
-            data = service.get_price_data(start, end, interval)
+            data = service.get_price_data(start, end, interval, method, width, fmt)
         elif data_type == 'spread':
-            data = service.get_spread_data(start, end, interval)
+            data = service.get_spread_data(start, end, interval, method, width, fmt)
         elif data_type == 'heatmap':
-            data = service.get_heatmap_data(start, end)
+            metric = request.args.get('metric', 'spread')
+            if metric not in service.HEATMAP_METRICS:
+                return jsonify({"error": "Unknown heatmap metric"}), 400
+            data = service.get_heatmap_data(start, end, metric, fmt)
+            if arrow:
+                return _arrow_response(data, {"metric": metric})
         elif data_type == 'correlation':
-            data = service.get_correlation_data(start, end)
+            max_lag = request.args.get('maxLag', config.CORRELATION_MAX_LAG, type=int)
+            if not 0 <= max_lag <= config.CORRELATION_MAX_LAG_LIMIT:
+                return jsonify({"error": f"maxLag must be 0-{config.CORRELATION_MAX_LAG_LIMIT}"}), 400
+            data = service.get_correlation_data(start, end, max_lag, fmt)
+            if arrow:
+                # data 是缓存中的共享对象，不能修改
+                return _arrow_response(data["lags"], {k: v for k, v in data.items() if k != "lags"})
         else:
             return jsonify({"error": "Unknown data type"}), 400
 
-        return jsonify(data)
+        return _json(data)
 
     except Exception as e:
-        print(f"API Error: {e}")
+        log.exception("getdata failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route("/app/getresult", methods=["GET"])
+@_conditional
 def getresult():
     """
-    获取回测结果或信号
+    获取回测结果、信号或参数扫描结果
+    Type: backtest | signals | sweep
     Params: start, end, type, zThreshold, tradeSize
+            sweep: zThresholds, tradeSizes (逗号分隔列表，缺省使用 Config 中的网格)
+            backtest: fields (stats,equity,signals 的子集，默认全部)、includeSignals=false (不含逐笔信号)、
+                      equityPoints=N (权益曲线按 M4 降到不超过 N 个点，N >= 4)
+            signals: format=ndjson 逐行流式输出 (每行一个信号)；
+                     after=<timestamp>,<id> 与 limit 为键集分页，返回 {"signals": [...], "next": 下一页的 after}
+    Accept: application/vnd.apache.arrow.stream 时返回 Arrow IPC 流：
+            signals 为逐笔结果表，backtest 为权益曲线 (汇总统计在 schema 元数据中)，sweep 为长表
     """
     try:
-        default_start, default_end = _get_default_dates()
-        
-        # 1. 解析时间
-        start = request.args.get('start', type=int)
-        if start is None: start = default_start
-            
-        end = request.args.get('end', type=int)
-        if end is None: end = default_end
-            
-        res_type = request.args.get('type', 'backtest')
-        
-        # 2. 解析分析参数 (默认值来自 Config 的 ANALYSIS_PARAMS)
-        # 注意: Config 中 trade_size_usdt 是 USDT 金额，这里作为 tradeSize 传入
-        default_trade_size = config.ANALYSIS_PARAMS.get('trade_size_usdt', 10000)
-        
-        z_threshold = float(request.args.get('zThreshold', 2.0))
-        trade_size = float(request.args.get('tradeSize', default_trade_size))
-        
-        print(f"API Request: getresult type={res_type}, size={trade_size}")
+        service = _service()
+        with tracing.span("parse_params"):
+            default_start, default_end = _get_default_dates()
+
+            # 1. 解析时间
+            start = request.args.get('start', type=int)
+            if start is None: start = default_start
+
+            end = request.args.get('end', type=int)
+            if end is None: end = default_end
+
+            res_type = request.args.get('type', 'backtest')
+
+            # 2. 解析分析参数 (默认值来自 Config 的 ANALYSIS_PARAMS)
+            # 注意: Config 中 trade_size_usdt 是 USDT 金额，这里作为 tradeSize 传入
+            default_trade_size = config.ANALYSIS_PARAMS.get('trade_size_usdt', 10000)
+
+            try:
+                z_threshold = _parse_float(request.args.get('zThreshold', 2.0), 'zThreshold')
+                trade_size = _parse_float(request.args.get('tradeSize', default_trade_size), 'tradeSize',
+                                          positive=True)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        if res_type == 'sweep':
+            try:
+                z_list = _get_float_list('zThresholds', config.SWEEP_Z_THRESHOLDS)
+                size_list = _get_float_list('tradeSizes', config.SWEEP_TRADE_SIZES, positive=True)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if not z_list or not size_list or len(z_list) * len(size_list) > config.SWEEP_MAX_GRID:
+                return jsonify({"error": f"Sweep grid must have 1-{config.SWEEP_MAX_GRID} cells"}), 400
+            if _wants_arrow():
+                return _arrow_response(service.get_sweep_columns(start, end, z_list, size_list))
+            return _json(service.run_sweep(start, end, z_list, size_list))
+
+        if _wants_arrow() and res_type in ('signals', 'backtest'):
+            return _arrow_result(res_type, start, end, z_threshold, trade_size)
+
+        if res_type == 'signals':
+            after = request.args.get('after')
+            limit = request.args.get('limit', type=int)
+            if after is not None:
+                try:
+                    after_ts, after_id = (int(x) for x in after.split(','))
+                except ValueError:
+                    return jsonify({"error": "after must be <timestamp>,<id>"}), 400
+                after = (after_ts, after_id)
+            if limit is not None and not 1 <= limit <= config.SIGNALS_PAGE_MAX_LIMIT:
+                return jsonify({"error": f"limit must be 1-{config.SIGNALS_PAGE_MAX_LIMIT}"}), 400
+            if request.args.get('format') == 'ndjson':
+                items = service.iter_signals(start, end, z_threshold, trade_size, after)
+                if limit is not None:
+                    items = itertools.islice(items, limit)
+                return Response(_ndjson(items), mimetype="application/x-ndjson")
+            if after is not None or limit is not None:
+                return _json(service.get_signal_page(start, end, z_threshold, trade_size, after, limit))
     
         # 3. 调用 service
-        signals, backtest_stats = service.run_backtest(start, end, z_threshold, trade_size)
-
         if res_type == 'signals':
-            return jsonify(signals)
+            signals, _ = service.run_backtest(start, end, z_threshold, trade_size)
+            return _json(signals)
         elif res_type == 'backtest':
-            return jsonify(backtest_stats)
+            fields = request.args.get('fields')
+            fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else list(service.BACKTEST_FIELDS)
+            if not fields or any(f not in service.BACKTEST_FIELDS for f in fields):
+                return jsonify({"error": f"fields must be a subset of {','.join(service.BACKTEST_FIELDS)}"}), 400
+            if request.args.get('includeSignals', 'true').lower() in ('false', '0', 'no'):
+                fields = [f for f in fields if f != 'signals']
+                if not fields:
+                    return jsonify({"error": "fields=signals conflicts with includeSignals=false"}), 400
+            equity_points = request.args.get('equityPoints', type=int)
+            if equity_points is not None and equity_points < 4:
+                return jsonify({"error": "equityPoints must be >= 4"}), 400
+            # 按 BACKTEST_FIELDS 的顺序排列，相同组合共用缓存
+            fields = tuple(f for f in service.BACKTEST_FIELDS if f in fields)
+            return _json(service.get_backtest_result(start, end, z_threshold, trade_size, fields, equity_points))
         else:
             return jsonify({"error": "Unknown result type"}), 400
 
     except Exception as e:
-        print(f"API Error: {e}")
+        log.exception("getresult failed")
         return jsonify({"error": str(e)}), 500
 
+def _ndjson(items, lines_per_chunk=500):
+    """逐行 JSON (NDJSON)：每攒够 lines_per_chunk 行写出一次，避免过多的小块写入"""
+    lines = []
+    for item in items:
+        lines.append(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+        if len(lines) >= lines_per_chunk:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+def _arrow_result(res_type, start, end, z_threshold, trade_size):
+    """回测结果的 Arrow 输出：列直接来自回测数组，不经过逐笔字典"""
+    service = _service()
+    columns, equity, bt_stats = service.get_trade_columns(start, end, z_threshold, trade_size)
+    params = {"zThreshold": z_threshold, "tradeSize": trade_size}
+    if res_type == 'signals':
+        return _arrow_response(columns, params)
+    curve = {"time": [start] + columns["time"].tolist(), "equity": equity}
+    return _arrow_response(curve, {**params, **service.summarize_backtest(bt_stats)})
+
+def _ai_unavailable(status, content):
+    response = jsonify({"content": content, "functionCall": None})
+    response.status_code = status
+    response.headers["Retry-After"] = str(config.AI_RETRY_AFTER_SECONDS)
+    return response
+
 @app.route("/app/ai/chat", methods=["POST"])
 def ai_chat():
     """
@@ -124,15 +527,22 @@ def ai_chat():
         if not message:
             return jsonify({"error": "消息不能为空"}), 400
         
-        print(f"AI Chat Request: page={context.get('page', 'unknown')}, message={message[:50]}...")
-        
-        # 调用 AI 服务
-        result = ai_service.chat_with_ai(message, context)
+        # 调用 AI 服务：在 AI 线程池中执行，已满时立即返回 429，等待过久返回 503
+        try:
+            future = ai_service.submit_chat(message, context)
+        except ai_service.Saturated:
+            return _ai_unavailable(429, "AI 助手繁忙，请稍后重试。")
+        try:
+            result = future.result(timeout=config.AI_REQUEST_TIMEOUT_SECONDS)
+        except concurrent.futures.TimeoutError:
+            # 仍在排队的请求直接取消 (不再发往上游)，名额由完成回调归还
+            future.cancel()
+            return _ai_unavailable(503, "AI 服务响应超时，请稍后重试。")
         
         return jsonify(result)
         
     except Exception as e:
-        print(f"AI Chat Error: {e}")
+        log.exception("ai chat failed")
         return jsonify({
             "content": f"发生错误：{str(e)}",
             "functionCall": None
@@ -254,10 +664,76 @@ def check_auth():
             "user": None
         })
 
+@app.route("/app/health", methods=["GET"])
+def health():
+    """就绪探针：数据装载完成前返回 503"""
+    if not _data_ready():
+        _start_warm_up()
+        return jsonify({"status": "loading", "ready": False}), 503
+    return jsonify({"status": "ok", "ready": True, "version": sys.modules["service"].data_loader.version,
+                    "pid": os.getpid()})
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus 文本格式的监控指标 (本进程)"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+def _is_admin():
+    return bool(session.get('logged_in')) and session.get('username') == 'admin'
+
+@app.route("/app/admin/reload", methods=["POST"])
+def admin_reload():
+    """
+    重新装载数据文件 (后台构建新快照后原子替换，期间请求不受影响)
+    Body (可选): { "wait": true } 等待装载完成后返回
+    """
+    if not _is_admin():
+        return jsonify({"error": "需要管理员权限"}), 403
+    try:
+        data = request.get_json(silent=True) or {}
+        service = _service()
+        started = service.data_loader.reload_async()
+        if data.get("wait"):
+            service.data_loader.wait_reload()
+        return jsonify({"started": started, **service.data_loader.status()})
+    except Exception as e:
+        print(f"Admin Reload Error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/app/admin/data", methods=["GET"])
+def admin_data_status():
+    """当前数据快照的版本、来源与装载状态"""
+    if not _is_admin():
+        return jsonify({"error": "需要管理员权限"}), 403
+    return jsonify(_service().data_loader.status())
+
+@app.route("/app/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """
+    采样分析设置与最近写出的文件
+    Body (POST): { "next": N } 分析接下来的 N 个请求；{ "sampleEvery": N } 每 N 个请求抽样一个 (0 关闭)
+    """
+    if not _is_admin():
+        return jsonify({"error": "需要管理员权限"}), 403
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        try:
+            if "next" in data:
+                profiler.pending = max(0, int(data["next"]))
+            if "sampleEvery" in data:
+                profiler.sample_every = max(0, int(data["sampleEvery"]))
+        except (TypeError, ValueError):
+            return jsonify({"error": "next / sampleEvery must be integers"}), 400
+    return jsonify(profiler.status())
+
 def main():
     # 初始化数据库和默认用户
     auth.init_db()
     auth.init_default_user()
+
+    # 数据在后台装载，端口立即开始监听；就绪前数据接口返回 503
+    _start_warm_up(watch=config.HOT_RELOAD)
+    quiet_server_log()
     
     print(f"Starting Flask API on port {config.PORT}...")
     app.run(host=config.HOST, port=config.PORT, debug=config.DEBUG)
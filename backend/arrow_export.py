@@ -0,0 +1,77 @@
+"""
+Apache Arrow IPC 流式输出 (Accept: application/vnd.apache.arrow.stream)
+pyarrow 为可选依赖，只在第一次输出 Arrow 时导入；未安装时 available() 返回 False，接口返回 406。
+数值列直接引用 numpy 缓冲区 (零复制)，按 config.ARROW_BATCH_ROWS 行切分为 record batch，
+每写出一个 batch 就交给 HTTP 响应发送，大批量导出不需要逐值编码 JSON。
+"""
+import functools
+import importlib.util
+import json
+
+import config
+
+MIME_TYPE = "application/vnd.apache.arrow.stream"
+
+
+@functools.lru_cache(maxsize=None)
+def available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _to_arrow(pa, values):
+    """数组 -> Arrow 数组：数值 ndarray 零复制，分类列转为字典编码，其余按对象转换"""
+    import pandas as pd
+
+    if isinstance(values, pd.Categorical):
+        codes = values.codes
+        return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0),
+                                              pa.array(values.categories.to_numpy(dtype=str)))
+    if getattr(values, "dtype", None) is not None and values.dtype.kind in "biuf":
+        return pa.array(values)
+    return pa.array(list(values))
+
+
+class _ChunkSink:
+    """收集 IPC writer 写出的字节，每个 batch 写完后由 stream() 取走"""
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def stream(columns, metadata=None, batch_rows=None):
+    """
+    把 {列名: 数组} 写为 Arrow IPC 流，返回逐块产出 bytes 的迭代器 (schema、各 record batch、结束标记)
+    metadata 中的值以 JSON 字符串写入 schema 元数据
+    """
+    import pyarrow as pa
+
+    # 表在调用时立即构建 (列类型错误等在开始发送响应前抛出)，写出过程是惰性的
+    table = pa.Table.from_arrays([_to_arrow(pa, v) for v in columns.values()], names=list(columns))
+    if metadata:
+        table = table.replace_schema_metadata({k: json.dumps(v) for k, v in metadata.items()})
+
+    def generate():
+        sink = _ChunkSink()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            yield sink.take()
+            for batch in table.to_batches(max_chunksize=batch_rows or config.ARROW_BATCH_ROWS):
+                writer.write_batch(batch)
+                yield sink.take()
+        yield sink.take()
+
+    return generate()
@@ -3,15 +3,22 @@
 """
 import sqlite3
 import os
+from contextlib import closing
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
 # 数据库文件路径
 DB_PATH = os.path.join(os.path.dirname(__file__), "users.db")
+# 并发写入 (登录更新 last_login、注册) 时等待写锁的秒数，超时才报 database is locked
+DB_TIMEOUT = 10
+
+def _connect():
+    """每次调用新建连接 (sqlite 连接不能跨线程共享)，配合 closing() 使用，出错时也会关闭"""
+    return sqlite3.connect(DB_PATH, timeout=DB_TIMEOUT)
 
 def init_db():
     """初始化数据库，创建用户表"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     
     # 创建用户表
@@ -31,7 +38,7 @@ def init_db():
 
 def init_default_user():
     """初始化默认账号 admin/123456"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect()
     cursor = conn.cursor()
     
     # 检查是否已存在 admin 用户
@@ -58,35 +65,30 @@ def verify_user(username, password):
     """
     验证用户登录
     返回: (success: bool, message: str)
+    校验密码 (耗时的哈希计算) 时不持有数据库连接，避免读锁阻塞其他请求的写入
     """
     if not username or not password:
         return False, "用户名和密码不能为空"
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     # 查询用户
-    cursor.execute('SELECT password_hash FROM users WHERE username = ?', (username,))
-    result = cursor.fetchone()
+    with closing(_connect()) as conn:
+        result = conn.execute('SELECT password_hash FROM users WHERE username = ?', (username,)).fetchone()
     
     if not result:
-        conn.close()
         return False, "用户名或密码错误"
     
     password_hash = result[0]
     
     # 验证密码
-    if check_password_hash(password_hash, password):
-        # 更新最后登录时间
-        cursor.execute('''
+    if not check_password_hash(password_hash, password):
+        return False, "用户名或密码错误"
+
+    # 更新最后登录时间
+    with closing(_connect()) as conn, conn:
+        conn.execute('''
             UPDATE users SET last_login = ? WHERE username = ?
         ''', (datetime.now().isoformat(), username))
-        conn.commit()
-        conn.close()
-        return True, "登录成功"
-    else:
-        conn.close()
-        return False, "用户名或密码错误"
+    return True, "登录成功"
 
 def create_user(username, password):
     """
@@ -102,43 +104,35 @@ def create_user(username, password):
     if len(password) < 6:
         return False, "密码至少需要6个字符"
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     # 检查用户名是否已存在
-    cursor.execute('SELECT id FROM users WHERE username = ?', (username,))
-    if cursor.fetchone():
-        conn.close()
-        return False, "用户名已存在"
+    with closing(_connect()) as conn:
+        if conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone():
+            return False, "用户名已存在"
     
-    # 创建新用户
+    # 创建新用户 (哈希在连接外计算)
     password_hash = generate_password_hash(password)
     created_at = datetime.now().isoformat()
     
     try:
-        cursor.execute('''
-            INSERT INTO users (username, password_hash, created_at)
-            VALUES (?, ?, ?)
-        ''', (username, password_hash, created_at))
-        conn.commit()
-        conn.close()
+        with closing(_connect()) as conn, conn:
+            conn.execute('''
+                INSERT INTO users (username, password_hash, created_at)
+                VALUES (?, ?, ?)
+            ''', (username, password_hash, created_at))
         return True, "用户创建成功"
+    except sqlite3.IntegrityError:
+        # 并发注册同一用户名时，检查之后被另一个请求抢先插入
+        return False, "用户名已存在"
     except Exception as e:
-        conn.close()
         return False, f"创建用户失败: {str(e)}"
 
 def get_user_info(username):
     """获取用户信息"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, username, created_at, last_login
-        FROM users WHERE username = ?
-    ''', (username,))
-    
-    result = cursor.fetchone()
-    conn.close()
+    with closing(_connect()) as conn:
+        result = conn.execute('''
+            SELECT id, username, created_at, last_login
+            FROM users WHERE username = ?
+        ''', (username,)).fetchone()
     
     if result:
         return {
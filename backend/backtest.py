@@ -0,0 +1,156 @@
+"""
+向量化回测引擎
+所有逐笔指标 (价差百分比、毛利、成本、净利、权益、回撤、夏普) 均以数组运算完成，
+service.run_backtest 只负责把结果组装为前端需要的 JSON 结构。
+"""
+import numpy as np
+
+import config
+
+INITIAL_CAPITAL = 10000.0
+# 费率配置：Uniswap 0.3% + Binance 0.1%，Gas 按每笔固定成本估算
+FEE_RATE = config.ANALYSIS_PARAMS["uniswap_fee_pct"] + config.ANALYSIS_PARAMS["binance_fee_pct"]
+GAS_COST = float(config.ANALYSIS_PARAMS["gas_cost_estimate"])
+
+
+def _column(df, col, default):
+    """取出一列为 float64 数组；列不存在时以 default 填充 (对应旧版 item.get(col, default))"""
+    if col not in df.columns:
+        return np.full(len(df), default, dtype=np.float64)
+    return df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def select_trades(df_sig, z_threshold):
+    """按 |zscore| >= z_threshold 选出成交信号，返回 (行下标, |z|)；zscore 缺失的信号不成交"""
+    z = np.abs(_column(df_sig, "zscore", 0.0))
+    with np.errstate(invalid="ignore"):
+        idx = np.flatnonzero(~np.isnan(z) & (z >= z_threshold))
+    return idx, z[idx]
+
+
+def trade_pnl(spread_pct, trade_size):
+    """逐笔收益：毛利 = 投入 * 价差百分比，成本 = 手续费 + Gas，净利 = 毛利 - 成本"""
+    gross = trade_size * spread_pct
+    cost = np.full(len(spread_pct), trade_size * FEE_RATE + GAS_COST)
+    return gross, cost, gross - cost
+
+
+def equity_stats(net_profit, capital=INITIAL_CAPITAL):
+    """
+    由逐笔净利计算权益曲线与风险指标，沿最后一维计算 (二维输入时每行是一组参数)
+    返回 (权益曲线 (含初始资金，保留两位小数), 最大回撤, 夏普比率)
+    """
+    net_profit = np.asarray(net_profit, dtype=np.float64)
+    start = np.zeros(net_profit.shape[:-1] + (1,))
+    equity = np.round(capital + np.concatenate((start, np.cumsum(net_profit, axis=-1)), axis=-1), 2)
+
+    peak = np.maximum.accumulate(equity, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        max_drawdown = np.maximum(0.0, np.nanmax((peak - equity) / peak, axis=-1))
+
+        sharpe_ratio = np.zeros(equity.shape[:-1])
+        if equity.shape[-1] > 2:
+            returns = np.diff(equity, axis=-1) / equity[..., :-1]
+            std = returns.std(axis=-1, ddof=1)
+            ok = np.isfinite(std) & (std != 0)
+            sharpe_ratio = np.where(ok, returns.mean(axis=-1) / np.where(ok, std, 1.0), 0.0)
+    return equity, max_drawdown, sharpe_ratio
+
+
+def run(df_sig, z_threshold, trade_size):
+    """
+    执行回测，返回 (逐笔结果列字典, 汇总统计)
+    列字典中的数组均与成交信号一一对应，按时间升序
+    """
+    idx, z = select_trades(df_sig, z_threshold)
+    trades = df_sig.iloc[idx]
+
+    price_diff = _column(trades, "price_difference", 0.0)
+    cex_price = _column(trades, "binance_close_price", 1.0)
+    spread_pct = np.abs(price_diff) / cex_price
+    gross, cost, net = trade_pnl(spread_pct, trade_size)
+    equity, max_drawdown, sharpe_ratio = equity_stats(net)
+
+    total = len(idx)
+    winning = int(np.count_nonzero(net > 0))
+    total_profit = float(net.sum())
+
+    columns = {
+        "trades": trades,
+        "zscore": z,
+        "spread_pct": spread_pct,
+        "gross_profit": gross,
+        "total_cost": cost,
+        "net_profit": net,
+        # Mock 置信度：Z-score 越高置信度越高，映射到 0.5 - 0.99
+        "confidence": np.minimum(0.99, 0.5 + z / 10.0),
+        "equity": equity,
+    }
+    stats = {
+        "totalTrades": total,
+        "winningTrades": winning,
+        "winRate": winning / total if total > 0 else 0,
+        "totalProfit": total_profit,
+        "avgProfit": total_profit / total if total > 0 else 0,
+        "maxDrawdown": float(max_drawdown),
+        "sharpeRatio": float(sharpe_ratio),
+    }
+    return columns, stats
+
+
+# 参数扫描时单次处理的矩阵元素上限 (交易规模数 × 成交笔数)，控制内存占用
+_SWEEP_CHUNK_ELEMENTS = 4_000_000
+
+
+def sweep(df_sig, z_thresholds, trade_sizes):
+    """
+    一次性评估 z 阈值 × 交易规模网格
+    信号按 |z| 降序排序一次：阈值 t 对应的成交集合是排序后的前缀，
+    成交笔数、总利润、胜率由前缀和直接得到；回撤与夏普依赖时间顺序，
+    对每个阈值按时间顺序取子集后，对所有交易规模做一次二维向量化计算。
+    返回 {指标名: ndarray[len(z_thresholds), len(trade_sizes)]}，totalTrades 为一维
+    """
+    z_thresholds = np.asarray(z_thresholds, dtype=np.float64)
+    sizes = np.asarray(trade_sizes, dtype=np.float64)
+
+    z = np.abs(_column(df_sig, "zscore", 0.0))
+    spread_pct = np.abs(_column(df_sig, "price_difference", 0.0)) / _column(df_sig, "binance_close_price", 1.0)
+    valid = ~np.isnan(z)
+    z, spread_pct = z[valid], spread_pct[valid]
+
+    # 前缀和 (按 |z| 降序)：count[t] 笔成交即为前 count[t] 个信号
+    order = np.argsort(-z, kind="stable")
+    count = np.searchsorted(-z[order], -z_thresholds, side="right")
+    spread_prefix = np.concatenate(([0.0], np.cumsum(spread_pct[order])))
+
+    # 净利 = size * (spread_pct - FEE_RATE) - GAS_COST > 0  <=>  spread_pct > FEE_RATE + GAS_COST / size
+    winning = np.empty((len(z_thresholds), len(sizes)), dtype=np.int64)
+    for j, size in enumerate(sizes):
+        win_prefix = np.concatenate(([0], np.cumsum(spread_pct[order] > FEE_RATE + GAS_COST / size)))
+        winning[:, j] = win_prefix[count]
+
+    trades = count[:, None]
+    total_profit = sizes[None, :] * spread_prefix[count][:, None] - trades * (sizes * FEE_RATE + GAS_COST)[None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_rate = np.where(trades > 0, winning / np.maximum(trades, 1), 0.0)
+
+    max_drawdown = np.zeros((len(z_thresholds), len(sizes)))
+    sharpe_ratio = np.zeros((len(z_thresholds), len(sizes)))
+    for i, threshold in enumerate(z_thresholds):
+        sp = spread_pct[z >= threshold]
+        if len(sp) == 0:
+            continue
+        rows = max(1, _SWEEP_CHUNK_ELEMENTS // len(sp))
+        for j in range(0, len(sizes), rows):
+            chunk = sizes[j:j + rows, None]
+            _, dd, sharpe = equity_stats(chunk * sp[None, :] - (chunk * FEE_RATE + GAS_COST))
+            max_drawdown[i, j:j + rows] = dd
+            sharpe_ratio[i, j:j + rows] = sharpe
+
+    return {
+        "totalTrades": count,
+        "totalProfit": total_profit,
+        "winRate": win_rate,
+        "maxDrawdown": max_drawdown,
+        "sharpeRatio": sharpe_ratio,
+    }
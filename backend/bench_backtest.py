@@ -0,0 +1,135 @@
+"""
+回测引擎基准测试：对比旧版 iterrows 实现与向量化实现
+运行: python bench_backtest.py [--sizes 10000 100000 500000] [--repeat 3]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import service
+
+START_TS = 1756684800  # 2025-09-01 00:00:00 UTC
+
+
+def make_signals(n, seed=0):
+    """生成 n 条一个月内的合成信号"""
+    rng = np.random.default_rng(seed)
+    diff = rng.normal(0, 30, n)
+    close = 4400 + rng.normal(0, 50, n)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "timestamp": np.sort(START_TS + rng.integers(0, 30 * 86400, n)),
+        "direction": np.where(diff > 0, "Long DEX", "Short DEX"),
+        "zscore": rng.normal(0, 2, n),
+        "uniswap_avg_price": close + diff,
+        "binance_close_price": close,
+        "price_difference": diff,
+    })
+
+
+def legacy_backtest(df_sig, start_ts, z_threshold, trade_size_usdt):
+    """旧版实现 (逐行 iterrows + Python 峰值循环)，仅作为对照"""
+    _safe_float = service._safe_float
+    signals = []
+    capital = 10000.0
+    current_equity = capital
+    equity_curve = [{"time": start_ts, "equity": capital}]
+    winning_trades = 0
+    total_trades_count = 0
+    total_profit = 0.0
+    FEE_RATE = 0.003 + 0.001
+    GAS_COST = 50.0
+
+    for _, item in df_sig.iterrows():
+        z = abs(item.get('zscore', 0))
+        if pd.isna(z) or z < z_threshold: continue
+        total_trades_count += 1
+        spread_pct = abs(item.get('price_difference', 0)) / item.get('binance_close_price', 1)
+        gross_profit = trade_size_usdt * spread_pct
+        total_cost = (trade_size_usdt * FEE_RATE) + GAS_COST
+        net_profit = gross_profit - total_cost
+        total_profit += net_profit
+        current_equity += net_profit
+        if net_profit > 0: winning_trades += 1
+        confidence = min(0.99, 0.5 + (z / 10.0))
+        signals.append({
+            "id": str(item.get('id', total_trades_count)),
+            "time": int(item.get('timestamp')),
+            "direction": item.get('direction', 'Long'),
+            "spread": _safe_float(item.get('price_difference')),
+            "spreadPct": _safe_float(spread_pct),
+            "zScore": _safe_float(z),
+            "size": trade_size_usdt,
+            "grossProfit": round(gross_profit, 2),
+            "totalCost": round(total_cost, 2),
+            "netProfit": round(net_profit, 2),
+            "confidence": round(confidence, 2),
+            "cexPrice": _safe_float(item.get('binance_close_price')),
+            "dexPrice": _safe_float(item.get('uniswap_avg_price')),
+            "params": {"zThreshold": z_threshold}
+        })
+        equity_curve.append({"time": int(item.get('timestamp')), "equity": round(current_equity, 2)})
+
+    win_rate = winning_trades / total_trades_count if total_trades_count > 0 else 0
+    avg_profit = total_profit / total_trades_count if total_trades_count > 0 else 0
+    equity_values = [e['equity'] for e in equity_curve]
+    peak = equity_values[0]
+    max_drawdown = 0.0
+    for val in equity_values:
+        if val > peak: peak = val
+        dd = (peak - val) / peak
+        if dd > max_drawdown: max_drawdown = dd
+    sharpe_ratio = 0
+    if len(equity_values) > 1:
+        returns = pd.Series(equity_values).pct_change().dropna()
+        if returns.std() != 0:
+            sharpe_ratio = returns.mean() / returns.std()
+    stats = {
+        "totalTrades": total_trades_count,
+        "winningTrades": winning_trades,
+        "winRate": round(win_rate, 4),
+        "totalProfit": round(total_profit, 2),
+        "avgProfit": round(avg_profit, 2),
+        "maxDrawdown": round(max_drawdown, 4),
+        "sharpeRatio": round(sharpe_ratio, 4),
+        "equity": equity_curve,
+        "signals": signals
+    }
+    return signals, stats
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--zThreshold", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    end_ts = START_TS + 30 * 86400
+    print(f"{'signals':>10} | {'trades':>8} | {'legacy (s)':>11} | {'vectorized (s)':>14} | {'speedup':>8}")
+    print("-" * 66)
+    for n in args.sizes:
+        df = make_signals(n)
+        service.data_loader.load_frames(service.data_loader.df_data, df)
+        run = lambda: service.run_backtest.uncached(START_TS, end_ts, args.zThreshold, 10000)
+        _, stats = run()
+
+        legacy_t = _best_of(lambda: legacy_backtest(df, START_TS, args.zThreshold, 10000), 1)
+        new_t = _best_of(run, args.repeat)
+        print(f"{n:>10} | {stats['totalTrades']:>8} | {legacy_t:>11.4f} | {new_t:>14.4f} | "
+              f"{legacy_t / new_t:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+service 层与接口的基准测试：在 1 个月 / 1 年 / 5 年的合成分钟数据 (synthetic_data.py) 上计时
+- service: get_price_data / get_spread_data / run_backtest，全区间与其中一天；cold 为不经结果缓存 (.uncached)，
+  warm 为缓存命中
+- api: 通过 Flask test client 请求 /app/getdata 与 /app/getresult (cold 每次先清空结果缓存)，包含参数解析、
+  JSON 序列化与压缩
+- 结果 (每项的最小值与中位数，毫秒) 可保存为 JSON 基线，之后的运行与基线对比，变慢超过容差时退出码为 1
+运行: python bench_service.py [--spans 1m 1y 5y] [--repeat 5] [--save baseline.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+import synthetic_data
+
+BASELINE_VERSION = 1
+DAY = 86400
+
+
+def _timings(fn, repeat):
+    """执行 repeat 次，返回 {"min_ms", "median_ms"}"""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"min_ms": round(min(samples), 3), "median_ms": round(statistics.median(samples), 3)}
+
+
+def _cases(service, client, start, end):
+    """(名称, 函数, 是否每次先清空结果缓存)；day 为区间中间的一天 (1m K 线，不经 rollup)"""
+    day_start = start + (end - start) // DAY // 2 * DAY
+    day_end = day_start + DAY
+
+    def get(url):
+        def call():
+            resp = client.get(url, headers={"Accept-Encoding": "gzip"})
+            assert resp.status_code == 200, (url, resp.status_code)
+            resp.get_data()
+        return call
+
+    window = f"start={start}&end={end}"
+    return [
+        ("service.get_price_data[full]", lambda: service.get_price_data.uncached(start, end), False),
+        ("service.get_price_data[day,1m]", lambda: service.get_price_data.uncached(day_start, day_end, '1m'), False),
+        ("service.get_spread_data[full]", lambda: service.get_spread_data.uncached(start, end), False),
+        ("service.get_spread_data[day,1m]",
+         lambda: service.get_spread_data.uncached(day_start, day_end, '1m'), False),
+        ("service.run_backtest[full]", lambda: service.run_backtest.uncached(start, end, 2.0, 10000), False),
+        ("service.run_backtest[full,warm]", lambda: service.run_backtest(start, end, 2.0, 10000), False),
+        ("api.getdata.price[full]", get(f"/app/getdata?type=price&{window}"), True),
+        ("api.getdata.spread[full]", get(f"/app/getdata?type=spread&{window}"), True),
+        ("api.getdata.price[day,1m]",
+         get(f"/app/getdata?type=price&interval=1m&start={day_start}&end={day_end}"), True),
+        ("api.getresult.backtest[full]", get(f"/app/getresult?type=backtest&{window}"), True),
+        ("api.getresult.backtest[full,warm]", get(f"/app/getresult?type=backtest&{window}"), False),
+        ("api.getresult.backtest[stats]",
+         get(f"/app/getresult?type=backtest&fields=stats&{window}"), True),
+    ]
+
+
+def run_span(span, repeat, out=sys.stdout):
+    """生成并装载 span 的合成数据，返回该 span 的结果字典"""
+    import api
+    import service
+
+    t0 = time.perf_counter()
+    df_data, df_signals = synthetic_data.dataset(span)
+    generate_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    service.data_loader.load_frames(df_data, df_signals)
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    start = int(df_data["timestamp"].iloc[0])
+    end = int(df_data["timestamp"].iloc[-1]) + 60
+    client = api.app.test_client()
+    results = {"load": {"min_ms": round(load_ms, 3), "median_ms": round(load_ms, 3)}}
+    for name, fn, cold in _cases(service, client, start, end):
+        fn()                                    # 预热 (warm 项同时填充缓存)
+        if cold:
+            def fn(call=fn):
+                service.result_cache.clear()
+                call()
+        results[name] = _timings(fn, repeat)
+        print(f"  {name:<36} {results[name]['min_ms']:>10.2f} {results[name]['median_ms']:>10.2f}", file=out)
+    return {"rows": len(df_data), "signals": len(df_signals), "generate_ms": round(generate_ms, 3),
+            "cases": results}
+
+
+def compare(current, baseline, tolerance=0.25, min_delta_ms=1.0):
+    """
+    按最小值对比两次结果，返回 [(span, 名称, 基线 ms, 当前 ms, 比值, 是否变慢)]
+    变慢：比值超过 1 + tolerance 且差值超过 min_delta_ms (避免亚毫秒级的项因抖动误报)
+    """
+    rows = []
+    for span, result in current["spans"].items():
+        old_cases = baseline.get("spans", {}).get(span, {}).get("cases", {})
+        for name, timing in result["cases"].items():
+            if name not in old_cases:
+                continue
+            old, new = old_cases[name]["min_ms"], timing["min_ms"]
+            ratio = new / old if old > 0 else float("inf")
+            rows.append((span, name, old, new, ratio,
+                         ratio > 1 + tolerance and new - old > min_delta_ms))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--spans", nargs="+", choices=list(synthetic_data.SPANS), default=list(synthetic_data.SPANS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="FILE", help="把结果写入基线文件")
+    parser.add_argument("--compare", metavar="FILE", help="与基线文件对比")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许变慢的比例 (默认 0.25)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # 访问日志不写到 stdout；trace 照常生成 (计入开销)，写到空设备
+    config.REQUEST_LOG = False
+    config.TRACE_FILE = os.devnull
+
+    current = {
+        "version": BASELINE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "numpy": np.__version__, "pandas": pd.__version__},
+        "repeat": args.repeat,
+        "spans": {},
+    }
+    for span in args.spans:
+        print(f"[{span}] {'case':<36} {'min (ms)':>10} {'median (ms)':>10}")
+        current["spans"][span] = result = run_span(span, args.repeat)
+        print(f"  {result['rows']} rows, {result['signals']} signals, load {result['cases']['load']['min_ms']:.0f} ms")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"[System] Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.tolerance, args.min_delta_ms)
+        print(f"\n{'span':<5} {'case':<36} {'baseline':>10} {'current':>10} {'ratio':>7}")
+        for span, name, old, new, ratio, slower in rows:
+            print(f"{span:<5} {name:<36} {old:>10.2f} {new:>10.2f} {ratio:>6.2f}x{'  SLOWER' if slower else ''}")
+        regressions = [r for r in rows if r[5]]
+        if regressions:
+            print(f"[System] {len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
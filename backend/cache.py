@@ -0,0 +1,121 @@
+"""
+进程内结果缓存：LRU + 内存上限 + 并发请求合并 (single-flight)
+多个看板同时发出相同的查询时，只有第一个请求执行计算，其余请求等待并共享结果。
+缓存的对象会被多个请求共享，调用方不能修改返回值。
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+# 估算列表大小时抽样的元素个数
+_SAMPLE_ITEMS = 16
+
+
+def estimate_size(obj, _depth=0):
+    """粗略估算对象占用的字节数；长列表按前若干个元素的平均大小外推"""
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+                          for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        if not obj:
+            return size
+        sample = obj[:_SAMPLE_ITEMS]
+        per_item = sum(estimate_size(x, _depth + 1) for x in sample) / len(sample)
+        return size + int(per_item * len(obj))
+    return size
+
+
+class _Flight:
+    """一次正在进行的计算，等待者通过 event 获取结果"""
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    def __init__(self, max_entries=256, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, size)
+        self._inflight = {}             # key -> _Flight
+        self._bytes = 0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        """命中则直接返回；未命中时同一 key 只计算一次，并发的相同请求等待该结果"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                generation = self._generation
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                # 计算期间缓存被清空 (数据已重新加载) 时不写入旧结果
+                if flight.error is None and generation == self._generation:
+                    self._store(key, flight.value)
+            flight.event.set()
+        return flight.value
+
+    def _store(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+
+    def clear(self):
+        """清空全部缓存 (数据重新加载时调用)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hitRate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
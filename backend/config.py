@@ -6,6 +6,8 @@ import os
 HOST = "0.0.0.0"  # 监听所有 IP，方便从局域网或 Docker 访问。若仅本机访问可改为 "127.0.0.1"
 PORT = 5319       # Flask 默认端口
 DEBUG = True      # 开发模式开启，生产环境请关闭
+# 多进程部署 (python serve.py)：工作进程数，0 表示 CPU 核数
+SERVE_WORKERS = 0
 
 # ==========================================
 # 2. 数据文件路径配置
@@ -13,6 +15,13 @@ DEBUG = True      # 开发模式开启，生产环境请关闭
 # 你的 service.py 会读取这些文件，定义在这里方便管理
 DATA_CSV_PATH = "merged_trading_data.csv"
 SIGNALS_CSV_PATH = "arbitrage_signals.csv"
+# 列式存储目录 (python data_store.py 由上面两个 CSV 生成)，存在且未过期时启动直接 mmap 打开
+DATA_STORE_DIR = "data_store"
+# 热加载：监视上述文件，变化后在后台构建新的数据快照并原子替换 (api.main 启动监视线程)
+HOT_RELOAD = True
+RELOAD_POLL_SECONDS = 5
+# 启动时数据在后台装载，完成前数据接口返回 503，客户端按此秒数 (Retry-After) 重试
+STARTUP_RETRY_AFTER_SECONDS = 1
 
 # ==========================================
 # 3. 默认时间范围
@@ -21,6 +30,9 @@ SIGNALS_CSV_PATH = "arbitrage_signals.csv"
 START_DATE = "2025-09-01"
 END_DATE = "2025-09-30"
 
+# 本地时区偏移 (小时)，与数据中 time_bucket 列一致 (UTC+8)，用于热力图的星期/小时分桶
+TIMEZONE_OFFSET_HOURS = 8
+
 # ==========================================
 # 4. 业务分析参数 (用于回测和计算)
 # ==========================================
@@ -34,8 +46,79 @@ ANALYSIS_PARAMS = {
     "profit_threshold_in_usdt": 100  # 最小利润阈值
 }
 
+# 参数扫描 (/app/getresult?type=sweep) 的默认网格：50 个 Z 阈值 × 20 个交易规模
+SWEEP_Z_THRESHOLDS = [round(0.1 * i, 1) for i in range(50)]
+SWEEP_TRADE_SIZES = [1000 * i for i in range(1, 21)]
+SWEEP_MAX_GRID = 10000            # 网格最大格子数
+
+# ==========================================
+# 5. 图表查询参数
+# ==========================================
+# 装载数据时预先聚合的时间粒度 (rollup 金字塔)，查询时按区间长度自动选择
+ROLLUP_LEVELS = ["1m", "5m", "15m", "1h", "4h", "1d"]
+MAX_CHART_POINTS = 1000           # 单条曲线返回的最大点数
+CORRELATION_MAX_LAG = 60         # 互相关默认计算的最大滞后 (分钟)
+CORRELATION_MAX_LAG_LIMIT = 1440  # maxLag 参数上限
+
+# 查询结果缓存 (LRU)：超过条目数或估算内存上限时淘汰最久未使用的结果
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# 信号流式输出 (format=ndjson) 与键集分页 (after=timestamp,id&limit=N)
+SIGNAL_STREAM_CHUNK_ROWS = 2048     # 每次回测并输出的信号行数
+SIGNALS_PAGE_DEFAULT_LIMIT = 500
+SIGNALS_PAGE_MAX_LIMIT = 10000
+
+# HTTP 缓存与压缩：数据接口返回 ETag (数据指纹 + 查询参数)，If-None-Match 命中时返回 304；
+# 结束时间早于当前时间的历史区间允许客户端缓存 HISTORICAL_MAX_AGE 秒，其余区间每次重新验证
+HISTORICAL_MAX_AGE = 3600
+# 响应体超过该字节数时按 Accept-Encoding 压缩 (br 需要安装 brotli，否则使用 gzip)
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Arrow IPC 输出 (Accept: application/vnd.apache.arrow.stream，需要安装 pyarrow) 每个 record batch 的行数
+ARROW_BATCH_ROWS = 64 * 1024
+
+# 请求监控 (GET /metrics，Prometheus 文本格式)：耗时 (秒) 与响应体大小 (字节) 直方图的分桶上界
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))     # 256B ~ 64MB
+# 每个请求写一行 JSON 访问日志 (后台线程写出，见 metrics.py)
+REQUEST_LOG = True
+# 日志与 trace 的写出线程每隔该秒数成批写出一次
+LOG_BATCH_SECONDS = 0.2
+
+# 按需采样分析 (profiler.py)：结果写到 PROFILE_DIR/<endpoint>/*.folded (火焰图格式)
+# 管理员请求带 PROFILE_HEADER 头时分析该请求；PROFILE_SAMPLE_EVERY = N 时每 N 个请求抽样一个 (0 关闭，可经管理员接口修改)
+PROFILE_DIR = "profiles"
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_SAMPLE_EVERY = 0
+PROFILE_HEADER = "X-Profile"
+
+# 请求链路追踪 (tracing.py)：每个请求各阶段的 span 按 OTLP/JSON 写入 TRACE_FILE，超过上限时轮转 (保留 3 个旧文件)
+# 多进程部署 (serve.py) 时每个工作进程写入各自的文件 (文件名加 pid)
+# 环境变量 LOG_DIR 指定输出目录 (测试时指向临时目录，见 conftest.py)，TRACING=0 关闭
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+TRACING = os.getenv("TRACING", "1") != "0"
+TRACE_FILE = os.path.join(LOG_DIR, "traces.jsonl")
+TRACE_FILE_MAX_BYTES = 64 * 1024 * 1024
+
+# 负载测试 (load_test.py) 的默认 SLO：每类请求的延迟分位数上限 (毫秒) 与允许的错误率 (5xx 与连接失败)
+LOAD_TEST_SLO_MS = {"p95": 500, "p99": 1500}
+LOAD_TEST_MAX_ERROR_RATE = 0.0
+
+# AI 分析助手 (ai_service.py)：上游 LLM 调用在专用线程池中执行，复用 keep-alive 连接
+# 同时调用数为 AI_MAX_CONCURRENCY，另外最多 AI_MAX_QUEUE 个请求排队，超出时返回 429；
+# 请求等待超过 AI_REQUEST_TIMEOUT_SECONDS (含排队) 时返回 503
+AI_MAX_CONCURRENCY = 4
+AI_MAX_QUEUE = 8
+AI_CONNECT_TIMEOUT_SECONDS = 5
+AI_READ_TIMEOUT_SECONDS = 30
+AI_REQUEST_TIMEOUT_SECONDS = 45
+AI_RETRY_AFTER_SECONDS = 5
+
 # ==========================================
-# 5. 区块链元数据 (保留作为参考)
+# 6. 区块链元数据 (保留作为参考)
 # ==========================================
 # 虽然目前读取 CSV，但保留这些信息有助于明确数据来源
 POOL_ADDRESS = "0x11b815efb8f581194ae79006d24e0d814b7697f6"
@@ -53,7 +136,7 @@ ETHERSCAN_API_KEY = "9A48U71U42BMHG4841H6IV72UF2B1RIA3X"
 UNISWAP_SUBGRAPH_URL = "https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v3"
 
 # ==========================================
-# 6. 数据库配置 (已弃用/备份)
+# 7. 数据库配置 (已弃用/备份)
 # ==========================================
 # 注意：当前项目已切换为 CSV 读取模式 (service.py/DataLoader)
 # 下方配置暂时不生效，仅作归档。
@@ -0,0 +1,96 @@
+"""
+测试共用设置：trace 等日志输出写到临时目录，不在 backend/ 下留下文件
+环境变量 LOG_DIR 同时传给 test_serve.py 启动的 serve.py 及其工作进程
+以及各测试文件共用的数据构造函数与 loaded fixture (from conftest import make_trading_data, ...)
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _log_dir(tmp_path_factory):
+    log_dir = str(tmp_path_factory.mktemp("logs"))
+    saved = os.environ.get("LOG_DIR"), config.TRACE_FILE
+    os.environ["LOG_DIR"] = log_dir
+    config.TRACE_FILE = os.path.join(log_dir, "traces.jsonl")
+    yield log_dir
+    if saved[0] is None:
+        os.environ.pop("LOG_DIR", None)
+    else:
+        os.environ["LOG_DIR"] = saved[0]
+    config.TRACE_FILE = saved[1]
+
+
+START_TS = 1756684800  # 2025-09-01 00:00:00 UTC
+
+
+def make_trading_data(n=600, seed=0, shuffle=False):
+    """构造 merged_trading_data 形状的分钟级数据"""
+    rng = np.random.default_rng(seed)
+    ts = START_TS + np.arange(n, dtype=np.int64) * 60
+    close = 4400 + np.cumsum(rng.normal(0, 2, n))
+    dex = close + rng.normal(0, 3, n)
+    dex[rng.random(n) < 0.1] = 0          # 无 swap 的分钟
+    dex[rng.random(n) < 0.05] = np.nan
+    df = pd.DataFrame({
+        "time_bucket": pd.to_datetime(ts, unit="s").strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": ts,
+        "uniswap_swap_count": rng.integers(0, 10, n),
+        "uniswap_total_volume_eth": rng.random(n) * 50,
+        "uniswap_avg_price": dex,
+        "uniswap_price_std": np.abs(rng.normal(0, 2, n)),
+        "binance_open": close,
+        "binance_high": close + 1,
+        "binance_low": close - 1,
+        "binance_close": close,
+        "binance_volume": rng.random(n) * 100,
+        "price_difference": np.where(dex > 0, dex - close, 0),
+        "price_ratio": np.where(dex > 0, dex / close, 0),
+    })
+    if shuffle:
+        df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    return df
+
+
+def make_signals(n=200, seed=1, shuffle=False):
+    """构造 arbitrage_signals 形状的信号数据"""
+    rng = np.random.default_rng(seed)
+    ts = np.sort(START_TS + rng.integers(0, 600 * 60, n))
+    diff = rng.normal(0, 30, n)
+    df = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "timestamp": ts,
+        "direction": np.where(diff > 0, "Long DEX", "Short DEX"),
+        "zscore": rng.normal(0, 2, n),
+        "net_profit": rng.normal(50, 200, n),
+        "uniswap_avg_price": 4400 + diff,
+        "binance_close_price": np.full(n, 4400.0),
+        "price_difference": diff,
+    })
+    if shuffle:
+        df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    return df
+
+
+@pytest.fixture
+def loaded():
+    """临时替换 DataLoader 中的数据，测试结束后还原"""
+    import service
+
+    loader = service.data_loader
+    saved = (loader.df_data, loader.df_signals)
+
+    def _load(df_data=None, df_signals=None):
+        loader.load_frames(
+            make_trading_data() if df_data is None else df_data,
+            make_signals() if df_signals is None else df_signals,
+        )
+        return loader
+
+    yield _load
+    loader.load_frames(*saved)
@@ -0,0 +1,198 @@
+"""
+列式数据存储：把 CSV 转换为每列一个 .npy 文件，启动时以 mmap 方式打开
+启动只读取 manifest 与少量元数据，各列数据在第一次被查询时才由操作系统按页载入。
+除原始表外，同时保存按时间排序后的派生结构 (rollup 金字塔、日历分桶键)，
+加载时无需重新排序或聚合。
+
+转换: python data_store.py [--out data_store]
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import config
+import schema
+
+FORMAT_VERSION = 2  # 2: 按 schema.py 存储紧凑列类型
+MANIFEST = "manifest.json"
+
+
+def _source_stamp(path):
+    """记录源文件的大小与修改时间，用于判断存储是否过期"""
+    try:
+        st = os.stat(path)
+        return {"size": st.st_size, "mtime": st.st_mtime}
+    except OSError:
+        return None
+
+
+def _settings():
+    """影响存储内容的配置：rollup 层级、日历键的时区偏移与列类型；与转换时不同则存储过期"""
+    return {
+        "rollup_levels": list(config.ROLLUP_LEVELS),
+        "timezone_offset_hours": config.TIMEZONE_OFFSET_HOURS,
+        "schema": {"data": schema.DATA_SCHEMA, "signals": schema.SIGNALS_SCHEMA},
+    }
+
+
+def write_table(table_dir, df):
+    """把 DataFrame 逐列写为 .npy；字符串列存为分类编码 + 类别表，返回列元数据"""
+    os.makedirs(table_dir, exist_ok=True)
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if series.dtype == object or isinstance(series.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            cat = pd.Categorical(series)
+            codes_dtype = np.int16 if len(cat.categories) < 2 ** 15 else np.int32
+            np.save(os.path.join(table_dir, f"{col}.npy"), cat.codes.astype(codes_dtype))
+            np.save(os.path.join(table_dir, f"{col}.categories.npy"),
+                    np.asarray(cat.categories.astype(str), dtype=str))
+            columns[col] = {"kind": "category"}
+        else:
+            np.save(os.path.join(table_dir, f"{col}.npy"), series.to_numpy())
+            columns[col] = {"kind": "array"}
+    return {"rows": len(df), "columns": columns}
+
+
+def read_table(table_dir, meta, mmap=True):
+    """按元数据读取表；数值列为只读 mmap，构造 DataFrame 时不复制"""
+    mode = "r" if mmap else None
+    data = {}
+    for col, info in meta["columns"].items():
+        arr = np.load(os.path.join(table_dir, f"{col}.npy"), mmap_mode=mode)
+        if info["kind"] == "category":
+            categories = np.load(os.path.join(table_dir, f"{col}.categories.npy"))
+            arr = pd.Categorical.from_codes(np.asarray(arr), categories=categories)
+        data[col] = arr
+    return pd.DataFrame(data, copy=False)
+
+
+def write_store(parts, out_dir, sources):
+    """
+    写入完整存储 (先写临时目录再整体替换，读者不会看到写了一半的存储)
+    parts 为 service.build_parts 的返回值
+    """
+    tmp_dir = out_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    tables = {
+        "data": write_table(os.path.join(tmp_dir, "data"), parts["df_data"]),
+        "signals": write_table(os.path.join(tmp_dir, "signals"), parts["df_signals"]),
+    }
+    rollups = {}
+    for seconds, (frame, _) in parts["rollups"].items():
+        name = f"rollup_{seconds}"
+        tables[name] = write_table(os.path.join(tmp_dir, name), frame)
+        rollups[str(seconds)] = name
+    np.save(os.path.join(tmp_dir, "data_calendar.npy"), parts["data_calendar"])
+    np.save(os.path.join(tmp_dir, "signals_calendar.npy"), parts["signals_calendar"])
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "sources": {path: _source_stamp(path) for path in sources},
+        "settings": _settings(),
+        "tables": tables,
+        "rollups": rollups,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_dir = out_dir.rstrip("/\\") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def read_manifest(store_dir):
+    try:
+        with open(os.path.join(store_dir, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("format") == FORMAT_VERSION else None
+
+
+def is_compatible(store_dir):
+    """存储存在，且转换时的配置 (见 _settings) 与当前一致；不检查源文件"""
+    manifest = read_manifest(store_dir)
+    return manifest is not None and manifest.get("settings") == _settings()
+
+
+def is_fresh(store_dir, sources):
+    """存储与当前配置一致，且源 CSV 都存在并自转换以来未被修改 (源文件缺失视为过期)"""
+    if not is_compatible(store_dir):
+        return False
+    recorded = read_manifest(store_dir)["sources"]
+    for path in sources:
+        current = _source_stamp(path)
+        if current is None or current != recorded.get(path):
+            return False
+    return True
+
+
+def read_store(store_dir, mmap=True):
+    """以 mmap 方式打开存储，返回与 service.build_parts 相同结构的字典"""
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No valid data store in {store_dir}")
+    tables = manifest["tables"]
+
+    def table(name):
+        return read_table(os.path.join(store_dir, name), tables[name], mmap)
+
+    def time_index(df):
+        if "timestamp" not in df.columns:
+            return np.empty(0, dtype=np.int64)
+        return df["timestamp"].to_numpy()
+
+    df_data, df_signals = table("data"), table("signals")
+    rollups = {}
+    for seconds, name in manifest["rollups"].items():
+        frame = table(name)
+        rollups[int(seconds)] = (frame, time_index(frame))
+    mode = "r" if mmap else None
+    return {
+        "df_data": df_data,
+        "data_ts": time_index(df_data),
+        "df_signals": df_signals,
+        "signals_ts": time_index(df_signals),
+        "rollups": rollups,
+        "data_calendar": np.load(os.path.join(store_dir, "data_calendar.npy"), mmap_mode=mode),
+        "signals_calendar": np.load(os.path.join(store_dir, "signals_calendar.npy"), mmap_mode=mode),
+    }
+
+
+def convert(data_csv, signals_csv, out_dir):
+    """读取 CSV，构建排序后的表与派生结构，写入列式存储"""
+    import service  # 延迟导入：service 依赖本模块
+
+    # 与直接读取 CSV (service._read_parts) 使用相同的列与类型
+    df_data = schema.read_csv(data_csv, schema.DATA_SCHEMA)
+    df_signals = schema.read_csv(signals_csv, schema.SIGNALS_SCHEMA)
+    parts = service.build_parts(df_data, df_signals)
+    write_store(parts, out_dir, [data_csv, signals_csv])
+    return parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CSV data into the columnar store")
+    parser.add_argument("--data", default=config.DATA_CSV_PATH)
+    parser.add_argument("--signals", default=config.SIGNALS_CSV_PATH)
+    parser.add_argument("--out", default=config.DATA_STORE_DIR)
+    args = parser.parse_args()
+
+    parts = convert(args.data, args.signals, args.out)
+    print(f"[System] Data store written to {args.out}: "
+          f"{len(parts['df_data'])} data rows, {len(parts['df_signals'])} signals, "
+          f"{len(parts['rollups'])} rollup levels")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+图表降采样：在点数受限的前提下保留曲线形状
+  stride  等间隔抽取 (旧行为)
+  m4      每个像素桶保留首/尾/最小/最大四个点，尖峰不会丢失
+  lttb    Largest-Triangle-Three-Buckets，在 M4 候选点上执行 (MinMaxLTTB)
+所有函数输入按 x 升序排列的数组，返回被选中点的下标 (升序)。
+"""
+import numpy as np
+
+METHODS = ("m4", "lttb", "stride")
+
+
+def stride(x, y, n_out):
+    """等间隔抽取 (旧版 df.iloc[::step])；步长向上取整，输出不超过 n_out 个点"""
+    step = max(1, -(-len(x) // max(1, n_out)))
+    return np.arange(0, len(x), step)
+
+
+def _bucket_starts(x, n_buckets):
+    """按 x 的取值范围等宽划分 n_buckets 个桶，返回每个非空桶的起始下标"""
+    span = float(x[-1] - x[0]) + 1.0
+    bucket = ((x - x[0]) * (n_buckets / span)).astype(np.int64)
+    return np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+
+
+def _segment_argext(y, starts, use_max):
+    """每段极值第一次出现的下标 (全向量化，O(n))"""
+    n = len(y)
+    reduce = np.fmax if use_max else np.fmin
+    ext = reduce.reduceat(y, starts)
+    lengths = np.diff(np.append(starts, n))
+    hit = y == np.repeat(ext, lengths)
+    pos = np.where(hit, np.arange(n), n)
+    idx = np.minimum.reduceat(pos, starts)
+    # 整段为 NaN 时没有命中，退回到段首
+    return np.where(idx < n, idx, starts)
+
+
+def m4(x, y, n_buckets):
+    """M4：每个桶保留首、尾、最小、最大四个点"""
+    n = len(x)
+    if n <= 4 * n_buckets:
+        return np.arange(n)
+    starts = _bucket_starts(x, n_buckets)
+    ends = np.append(starts[1:], n) - 1
+    picked = np.concatenate((starts, ends,
+                             _segment_argext(y, starts, use_max=False),
+                             _segment_argext(y, starts, use_max=True)))
+    return np.unique(picked)
+
+
+def lttb(x, y, n_out):
+    """
+    LTTB：先用 M4 取候选点 (保证桶内极值在候选中)，再在候选点上逐桶选取
+    与前一选中点、后一桶质心构成最大三角形面积的点
+    """
+    n = len(x)
+    if n <= n_out:
+        return np.arange(n)
+    if n_out < 3:
+        return stride(x, y, n_out)
+
+    cand = m4(x, y, n_out)
+    if len(cand) <= n_out:
+        return cand
+    cx = x[cand].astype(np.float64)
+    cy = np.nan_to_num(y[cand].astype(np.float64))
+
+    # 首尾固定，中间候选点平均分成 n_out - 2 个桶
+    edges = np.linspace(1, len(cand) - 1, n_out - 1).astype(np.int64)
+    sums_x = np.add.reduceat(cx[1:-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(cy[1:-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, cx[-1])
+    avg_y = np.append(sums_y / counts, cy[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, len(cand) - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # 三角形面积 (省略常数 1/2)：|(Cx-Ax)(Ay-y) - (Ax-x)(Cy-Ay)|
+        area = np.abs((avg_x[b + 1] - cx[a]) * (cy[a] - cy[lo:hi])
+                      - (cx[a] - cx[lo:hi]) * (avg_y[b + 1] - cy[a]))
+        a = lo + int(np.argmax(area))
+        selected[b + 1] = a
+    return cand[selected]
+
+
+def select(x, y, method="m4", width=None, limit=1000):
+    """
+    按 method 选取下标。width 为像素宽度提示：
+      m4 每像素最多 4 个点，默认且最多 limit // 4 个像素；
+      lttb / stride 输出 width 个点，默认且最多 limit 个
+    任何 width 下输出点数都不超过 limit (limit < 4 时 m4 按 stride 处理)
+    """
+    if len(x) == 0:
+        return np.arange(0)
+    if method == "m4" and limit >= 4:
+        buckets = limit // 4
+        return m4(x, y, min(width or buckets, buckets))
+    if method == "lttb":
+        return lttb(x, y, min(width or limit, limit))
+    return stride(x, y, min(width or limit, limit))
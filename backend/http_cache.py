@@ -0,0 +1,79 @@
+"""
+HTTP 条件请求与响应压缩 (api.py 中的数据接口使用)
+ETag 由数据指纹与查询参数计算，不需要先生成响应体：If-None-Match 命中时直接返回 304，不执行查询。
+压缩按 Accept-Encoding 协商 br / gzip；brotli 为可选依赖，未安装时只提供 gzip。
+流式响应 (Arrow) 逐块压缩，每块写出后立即 flush，不会等到全部数据生成后才发送。
+"""
+import functools
+import hashlib
+import importlib.util
+import time
+import zlib
+
+import config
+
+
+def make_etag(fingerprint, path, args, representation):
+    """同一份数据、同一组查询参数、同一种表示 (json / arrow) 得到相同的 ETag"""
+    key = repr((fingerprint, path, sorted(args), representation))
+    return hashlib.sha1(key.encode()).hexdigest()[:24]
+
+
+def matching_etag(if_none_match, etag):
+    """
+    If-None-Match 中与 etag 对应的标签 (包括压缩后的变体与代理改写的弱标签)，没有则返回 None
+    if_none_match 为 werkzeug 的 request.if_none_match
+    """
+    if if_none_match.star_tag:
+        return etag
+    for tag in (etag,) + tuple(f"{etag}-{enc}" for enc in ENCODINGS):
+        if if_none_match.contains_weak(tag):
+            return tag
+    return None
+
+
+def cache_control(end_ts, now=None):
+    """结束时间已过的历史区间数据不再变化，允许缓存；包含当前时间的区间每次重新验证"""
+    if end_ts < (time.time() if now is None else now):
+        return f"public, max-age={config.HISTORICAL_MAX_AGE}"
+    return "no-cache"
+
+
+ENCODINGS = ("br", "gzip")
+
+
+@functools.lru_cache(maxsize=None)
+def _supported_encodings():
+    # find_spec 会遍历 sys.path (每次都要 stat / getcwd)，结果在进程内缓存
+    if importlib.util.find_spec("brotli") is not None:
+        return ENCODINGS
+    return ("gzip",)
+
+
+def choose_encoding(accept_encodings):
+    """按 Accept-Encoding 选择 br / gzip (同等优先级时优先 br)，都不接受时返回 None"""
+    return accept_encodings.best_match(_supported_encodings())
+
+
+def _compressor(encoding):
+    """返回 (compress(chunk) -> bytes, flush() -> bytes, finish() -> bytes)"""
+    if encoding == "br":
+        import brotli
+        c = brotli.Compressor(quality=config.BROTLI_QUALITY)
+        return c.process, c.flush, c.finish
+    c = zlib.compressobj(config.GZIP_LEVEL, zlib.DEFLATED, 31)   # wbits=31: gzip 格式
+    return c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+
+
+def compress(data, encoding):
+    process, _, finish = _compressor(encoding)
+    return process(data) + finish()
+
+
+def compress_stream(chunks, encoding):
+    process, flush, finish = _compressor(encoding)
+    for chunk in chunks:
+        out = process(chunk) + flush()
+        if out:
+            yield out
+    yield finish()
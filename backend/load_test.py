@@ -0,0 +1,249 @@
+"""
+并发负载测试：多个客户端线程按混合比例请求接口，统计每类请求的 p50 / p95 / p99 延迟与吞吐量，超出 SLO 时退出码为 1
+- 默认在进程内通过 Flask test client 驱动 api.app，数据为 synthetic_data.py 生成的合成数据，用户库为临时 sqlite 文件
+- --url 时对已启动的服务 (python api.py / python serve.py --workers N) 发送 HTTP 请求，先以 --user/--password 登录
+- 请求组合见 WORKLOAD：getdata price / spread (随机的一天或全区间)、getresult backtest / signals (随机 z 阈值)、auth check
+运行: python load_test.py [--clients 16] [--duration 10] [--span 1m] [--url http://127.0.0.1:5000]
+                         [--slo p95=300 p99=1000] [--max-error-rate 0]
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+import config
+import synthetic_data
+
+DAY = 86400
+Z_THRESHOLDS = (1.5, 2.0, 2.5, 3.0)
+
+# (名称, 权重, 由 (start, end, rng) 生成请求路径的函数)
+WORKLOAD = [
+    ("getdata.price", 30, lambda s, e, rng: f"/app/getdata?type=price&{_window(s, e, rng)}"),
+    ("getdata.spread", 20, lambda s, e, rng: f"/app/getdata?type=spread&{_window(s, e, rng)}"),
+    ("getresult.backtest", 15,
+     lambda s, e, rng: f"/app/getresult?type=backtest&includeSignals=false&equityPoints=500"
+                       f"&zThreshold={rng.choice(Z_THRESHOLDS)}&{_window(s, e, rng)}"),
+    ("getresult.signals", 15,
+     lambda s, e, rng: f"/app/getresult?type=signals&limit=200&zThreshold={rng.choice(Z_THRESHOLDS)}"
+                       f"&{_window(s, e, rng)}"),
+    ("auth.check", 20, lambda s, e, rng: "/app/auth/check"),
+]
+
+
+def _window(start, end, rng):
+    """一半请求为区间内随机的一天 (1m K 线)，一半为全区间"""
+    if rng.random() < 0.5:
+        return f"start={start}&end={end}"
+    day = start + rng.randrange(max(1, (end - start) // DAY)) * DAY
+    return f"start={day}&end={day + DAY}&interval=1m"
+
+
+# ==========================================
+# 客户端
+# ==========================================
+def in_process_clients(username="admin"):
+    """返回 make_client()：每个客户端一个 test client，会话中已登录 username"""
+    import api
+
+    def make_client():
+        client = api.app.test_client()
+        with client.session_transaction() as sess:
+            sess["username"] = username
+            sess["logged_in"] = True
+
+        def send(path):
+            resp = client.get(path, headers={"Accept-Encoding": "gzip"})
+            resp.get_data()
+            resp.close()
+            return resp.status_code
+        return send
+    return make_client
+
+
+def http_clients(base_url, username, password, timeout=30):
+    """返回 make_client()：每个客户端一个带 cookie 的 urllib opener，创建时登录"""
+    def make_client():
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        login = urllib.request.Request(
+            base_url + "/app/auth/login", data=json.dumps({"username": username, "password": password}).encode(),
+            headers={"Content-Type": "application/json"}, method="POST")
+        opener.open(login, timeout=timeout).read()
+
+        def send(path):
+            try:
+                with opener.open(urllib.request.Request(base_url + path, headers={"Accept-Encoding": "gzip"}),
+                                 timeout=timeout) as resp:
+                    resp.read()
+                    return resp.status
+            except urllib.error.HTTPError as e:
+                e.read()
+                return e.code
+        return send
+    return make_client
+
+
+# ==========================================
+# 运行与统计
+# ==========================================
+def run(make_client, clients, duration, start, end, seed=0):
+    """
+    clients 个线程在 duration 秒内不停发送请求 (无思考时间)
+    返回 ({名称: [(耗时秒, 状态码)]}, 实际耗时秒)；请求抛出异常时状态码记为 0
+    """
+    names = [name for name, _, _ in WORKLOAD]
+    weights = [weight for _, weight, _ in WORKLOAD]
+    paths = {name: path for name, _, path in WORKLOAD}
+    records = {name: [] for name in names}
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients + 1)
+    deadline = [0.0]
+
+    def client(i):
+        rng = random.Random(seed + i)
+        send = make_client()
+        local = []
+        barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            name = rng.choices(names, weights)[0]
+            path = paths[name](start, end, rng)
+            t0 = time.perf_counter()
+            try:
+                status = send(path)
+            except Exception:
+                status = 0
+            local.append((name, time.perf_counter() - t0, status))
+        with lock:
+            for name, seconds, status in local:
+                records[name].append((seconds, status))
+
+    threads = [threading.Thread(target=client, args=(i,), name=f"load-client-{i}") for i in range(clients)]
+    for t in threads:
+        t.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    barrier.wait()
+    for t in threads:
+        t.join()
+    return records, time.perf_counter() - started
+
+
+def _stats(samples, elapsed):
+    ms = np.array([s for s, _ in samples]) * 1000
+    errors = sum(1 for _, status in samples if status == 0 or status >= 500)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0.0, 0.0, 0.0)
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "errorRate": round(errors / len(samples), 4) if samples else 0.0,
+        "rps": round(len(samples) / elapsed, 1),
+        "p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2),
+        "max": round(float(ms.max()), 2) if len(ms) else 0.0,
+    }
+
+
+def summarize(records, elapsed):
+    """每类请求与全部请求 ("all") 的统计，延迟单位为毫秒"""
+    summary = {name: _stats(samples, elapsed) for name, samples in records.items() if samples}
+    summary["all"] = _stats([s for samples in records.values() for s in samples], elapsed)
+    return summary
+
+
+def check_slo(summary, slo, max_error_rate):
+    """返回违反 SLO 的说明列表；slo 为 {"p95": 毫秒, ...}，对每类请求与全部请求分别检查"""
+    breaches = []
+    for name, stats in summary.items():
+        for key, limit in slo.items():
+            if stats[key] > limit:
+                breaches.append(f"{name} {key} {stats[key]:.1f}ms > {limit}ms")
+        if stats["errorRate"] > max_error_rate:
+            breaches.append(f"{name} error rate {stats['errorRate']:.2%} > {max_error_rate:.2%}")
+    return breaches
+
+
+def print_summary(summary, out=sys.stdout):
+    print(f"{'request':<20} {'count':>7} {'errors':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}",
+          file=out)
+    for name, s in summary.items():
+        print(f"{name:<20} {s['count']:>7} {s['errors']:>6} {s['rps']:>8.1f} {s['p50']:>8.1f} {s['p95']:>8.1f} "
+              f"{s['p99']:>8.1f} {s['max']:>8.1f}", file=out)
+
+
+def _parse_slo(items):
+    slo = dict(config.LOAD_TEST_SLO_MS)
+    for item in items or []:
+        key, _, value = item.partition("=")
+        if key not in ("p50", "p95", "p99") or not value:
+            raise argparse.ArgumentTypeError(f"SLO must be p50|p95|p99=<ms>, got {item!r}")
+        slo[key] = float(value)
+    return slo
+
+
+def _prepare_in_process(span):
+    """装载合成数据，用户库指向临时 sqlite 文件 (不修改仓库中的 users.db)"""
+    import auth
+    import service
+
+    auth.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="load-test-"), "users.db")
+    auth.init_db()
+    auth.init_default_user()
+    df_data, df_signals = synthetic_data.dataset(span)
+    service.data_loader.load_frames(df_data, df_signals)
+    return int(df_data["timestamp"].iloc[0]), int(df_data["timestamp"].iloc[-1]) + 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="秒")
+    parser.add_argument("--span", choices=list(synthetic_data.SPANS), default="1m", help="进程内运行时的合成数据时长")
+    parser.add_argument("--url", help="对已启动的服务发送请求，如 http://127.0.0.1:5000")
+    parser.add_argument("--start", type=int, help="--url 时请求的起始时间戳 (默认 Config 中的 START_DATE)")
+    parser.add_argument("--end", type=int)
+    parser.add_argument("--user", default="admin")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--slo", nargs="+", metavar="pXX=MS", help="覆盖 Config.LOAD_TEST_SLO_MS")
+    parser.add_argument("--max-error-rate", type=float, default=config.LOAD_TEST_MAX_ERROR_RATE)
+    parser.add_argument("--json", metavar="FILE", help="把统计结果写入 JSON 文件")
+    args = parser.parse_args()
+    slo = _parse_slo(args.slo)
+
+    if args.url:
+        import api
+        default_start, default_end = api._get_default_dates()
+        start, end = args.start or default_start, args.end or default_end
+        make_client = http_clients(args.url.rstrip("/"), args.user, args.password)
+    else:
+        # 访问日志不写到 stdout，trace 写到空设备 (开销照常计入)
+        config.REQUEST_LOG = False
+        config.TRACE_FILE = os.devnull
+        start, end = _prepare_in_process(args.span)
+        make_client = in_process_clients(args.user)
+
+    records, elapsed = run(make_client, args.clients, args.duration, start, end)
+    summary = summarize(records, elapsed)
+    print(f"[System] {args.clients} clients, {elapsed:.1f}s, {summary['all']['count']} requests")
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"clients": args.clients, "seconds": round(elapsed, 3), "slo": slo, "summary": summary}, f,
+                      indent=2)
+
+    breaches = check_slo(summary, slo, args.max_error_rate)
+    for breach in breaches:
+        print(f"[SLO] {breach}")
+    if breaches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
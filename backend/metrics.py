@@ -0,0 +1,277 @@
+"""
+请求监控指标 (Prometheus 文本格式) 与缓冲的结构化日志
+- Counter / Histogram 只用标准库实现，记录一次只是加锁后更新几个整数，不依赖 prometheus_client
+- 采集时才计算的值 (缓存命中、数据行数等) 通过 register_collector 注册回调
+- 日志记录先放入队列，由后台线程成批格式化为 JSON 行写到 stdout，请求线程不做格式化与 I/O
+多进程部署 (serve.py) 时每个工作进程各自统计，/metrics 返回处理该请求的进程的指标
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import config
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+_metrics = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, doc, labelnames=()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, labels=(), amount=1):
+        with _lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with _lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+        return lines
+
+
+class Histogram:
+    """累计分桶直方图；每个标签组合保存各桶计数 (最后一个为 +Inf)、总和与次数"""
+
+    def __init__(self, name, doc, labelnames=(), buckets=()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        _metrics.append(self)
+
+    def observe(self, labels, value):
+        i = bisect.bisect_left(self.buckets, value)     # 第一个 >= value 的桶 (le 语义)
+        with _lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def count(self, labels=()):
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for le, n in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', _number(le))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def register_collector(collect):
+    """
+    collect() 返回 [(name, type, doc, [(labels_dict, value), ...]), ...]，在每次采集时调用
+    type 为 counter / gauge
+    """
+    _collectors.append(collect)
+
+
+def render():
+    """全部指标的 Prometheus 文本格式"""
+    lines = []
+    for metric in _metrics:
+        lines += metric.render()
+    for collect in _collectors:
+        for name, kind, doc, samples in collect():
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ==========================================
+# 结构化日志
+# ==========================================
+class JsonFormatter(logging.Formatter):
+    """每条日志一行 JSON：ts、level、logger、event 与 extra={"fields": {...}} 中的字段"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _FlushMarker:
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class BatchWriter:
+    """
+    后台线程成批处理放入的对象，write(item) 在写出线程中调用
+    写出线程拿到第一项后等待 LOG_BATCH_SECONDS，再取出队列中的全部内容一起处理，线程唤醒次数与请求数无关
+    写出线程在本进程第一次 put 时启动：fork 出的工作进程 (serve.py) 各自启动自己的线程，
+    不会把内容放进父进程中无人读取的队列；close 之后 (解释器退出阶段) 在调用线程中直接处理
+    """
+
+    def __init__(self, write, flush=None, name="batch-writer"):
+        self._write_item = write
+        self._flush_target = flush
+        self._name = name
+        self._queue = None
+        self._pid = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.SimpleQueue()
+                threading.Thread(target=self._run, args=(self._queue,), name=self._name, daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self, items):
+        while True:
+            batch = [items.get()]
+            time.sleep(config.LOG_BATCH_SECONDS)
+            while True:
+                try:
+                    batch.append(items.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if isinstance(item, _FlushMarker):
+                    self._flush_quietly()
+                    item.event.set()
+                    continue
+                try:
+                    self._write_item(item)
+                except Exception:
+                    pass                    # 写出失败不能让线程退出
+
+    def _flush_quietly(self):
+        if self._flush_target is not None:
+            try:
+                self._flush_target()
+            except Exception:
+                pass
+
+    def put(self, item):
+        if self._closed:
+            self._write_item(item)
+            return
+        if self._pid != os.getpid():
+            self._start()
+        self._queue.put_nowait(item)
+
+    def flush(self, timeout=5):
+        """等待已放入的内容全部处理完"""
+        if self._pid == os.getpid() and not self._closed:
+            marker = _FlushMarker()
+            self._queue.put_nowait(marker)
+            marker.event.wait(timeout)
+        self._flush_quietly()
+
+    def close(self):
+        if not self._closed:
+            self.flush()
+            self._closed = True
+
+
+class BufferedHandler(logging.Handler):
+    """日志记录交给 BatchWriter，由写出线程格式化并写出到 target，请求线程不做格式化与 I/O"""
+
+    def __init__(self, target):
+        super().__init__()
+        self.target = target
+        self.writer = BatchWriter(self._write, target.flush, "log-writer")
+
+    def _write(self, item):
+        if isinstance(item, tuple):
+            # defer() 放入的 (logger 名, 时间, event, fields)，在写出线程中创建 LogRecord
+            name, created, event, fields = item
+            item = logging.LogRecord(name, logging.INFO, "", 0, event, None, None)
+            item.created = created
+            item.fields = fields
+        self.target.handle(item)
+
+    def handle(self, record):
+        # 放入队列无需加 handler 锁
+        if self.filter(record):
+            self.writer.put(record)
+        return record
+
+    def emit(self, record):
+        self.writer.put(record)
+
+    def defer(self, name, event, fields):
+        self.writer.put((name, time.time(), event, fields))
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+def get_logger(name, stream=None):
+    """带缓冲 JSON 输出的 logger (同名只配置一次)"""
+    logger = logging.getLogger(name)
+    if not any(isinstance(h, BufferedHandler) for h in logger.handlers):
+        target = logging.StreamHandler(stream or sys.stdout)
+        target.setFormatter(JsonFormatter())
+        logger.addHandler(BufferedHandler(target))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def log_event(logger, event, fields):
+    """
+    INFO 级别的结构化日志 (每个请求一条的访问日志等)：调用线程只把参数放入队列，
+    LogRecord 的创建 (查找调用位置等) 也在写出线程中进行
+    """
+    if logger.isEnabledFor(logging.INFO):
+        for handler in logger.handlers:
+            if isinstance(handler, BufferedHandler):
+                handler.defer(logger.name, event, fields)
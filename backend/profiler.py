@@ -0,0 +1,132 @@
+"""
+按需采样分析 (profiling) 线上请求，输出火焰图可用的 folded stacks
+- 被分析的请求在开始时登记自己的线程，后台采样线程每隔 PROFILE_INTERVAL_SECONDS 读取该线程的调用栈
+  (sys._current_frames)，请求结束 (流式响应发送完) 时把统计写入 PROFILE_DIR/<endpoint>/ 下的一个 .folded 文件
+- 触发方式：管理员请求带 X-Profile 头；管理员接口指定分析接下来的 N 个请求；或每 N 个请求抽样一个
+- 关闭时请求只做两次属性判断，采样线程不存在；有请求被分析时才启动，全部结束后退出
+输出格式为每行 "root;...;leaf 次数"，可直接交给 flamegraph.pl 或 speedscope
+"""
+import collections
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+
+import config
+
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def _safe_name(value):
+    """文件名中只保留 [A-Za-z0-9_-]"""
+    return _UNSAFE.sub("_", value)
+
+
+def fold(frame):
+    """调用栈折叠为 "文件:函数;...;文件:函数" (从外到内)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Session:
+    """一个请求的采样结果"""
+    __slots__ = ("thread_id", "endpoint", "label", "started", "stacks")
+
+    def __init__(self, thread_id, endpoint, label):
+        self.thread_id = thread_id
+        self.endpoint = endpoint
+        self.label = label
+        self.started = time.time()
+        self.stacks = collections.Counter()
+
+
+class Profiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}                  # thread id -> Session
+        self._thread = None
+        self._seq = itertools.count()
+        self._requests = itertools.count(1)
+        self.sample_every = config.PROFILE_SAMPLE_EVERY
+        self.pending = 0                   # 接下来要分析的请求数 (管理员接口设置)
+        self.recent = collections.deque(maxlen=20)
+
+    def should_profile(self):
+        """本次请求是否需要分析 (不含请求头触发)；关闭时只有两次属性判断"""
+        if self.pending > 0:
+            with self._lock:
+                if self.pending > 0:
+                    self.pending -= 1
+                    return True
+        if self.sample_every:
+            return next(self._requests) % self.sample_every == 0
+        return False
+
+    def start(self, endpoint, label=""):
+        session = Session(threading.get_ident(), endpoint, label)
+        with self._lock:
+            self._active[session.thread_id] = session
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session):
+        """结束采样并写出 folded 文件，返回文件路径"""
+        with self._lock:
+            self._active.pop(session.thread_id, None)
+        return self._write(session)
+
+    def _sample(self):
+        interval = config.PROFILE_INTERVAL_SECONDS
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                sessions = list(self._active.values())
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is not None:
+                    session.stacks[fold(frame)] += 1
+            del frames
+
+    def _write(self, session):
+        """写出 folded 文件；路径不在 PROFILE_DIR 之下时不写出，返回 None"""
+        root = os.path.realpath(config.PROFILE_DIR)
+        directory = os.path.join(root, _safe_name(session.endpoint))
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(session.started))
+        name = "-".join(filter(None, [_safe_name(session.label), stamp, str(os.getpid()), str(next(self._seq))]))
+        path = os.path.join(directory, name + ".folded")
+        if os.path.commonpath([root, os.path.realpath(path)]) != root:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            for stack, count in session.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(path + ".tmp", path)
+        self.recent.append({"path": path, "samples": sum(session.stacks.values()),
+                            "seconds": round(time.time() - session.started, 4)})
+        return path
+
+    def status(self):
+        return {
+            "sampleEvery": self.sample_every,
+            "pending": self.pending,
+            "active": len(self._active),
+            "intervalSeconds": config.PROFILE_INTERVAL_SECONDS,
+            "directory": os.path.abspath(config.PROFILE_DIR),
+            "recent": list(self.recent),
+        }
+
+
+profiler = Profiler()
@@ -0,0 +1,149 @@
+"""
+多分辨率预聚合 (rollup pyramid)
+在数据装载时把分钟级 merged_trading_data 聚合为 1m/5m/15m/1h/4h/1d 各级 K 线，
+查询时直接读取合适的级别，不再每次扫描原始分钟行。
+"""
+import numpy as np
+import pandas as pd
+
+_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_interval(interval, default=60):
+    """'15m' / '1h' / '1d' -> 秒数，无法解析时返回 default"""
+    try:
+        text = str(interval).strip().lower()
+        seconds = int(text[:-1]) * _UNITS[text[-1]]
+        return seconds if seconds > 0 else default
+    except (KeyError, ValueError, IndexError):
+        return default
+
+
+def _segment_mean(values, valid, starts):
+    """分段均值，仅统计 valid 且非 NaN 的元素；无有效元素的段返回 NaN"""
+    valid = valid & ~np.isnan(values)
+    total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    count = np.add.reduceat(valid.astype(np.int64), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def _segment_pick(values, valid, starts, last):
+    """取每段第一个 (last=False) 或最后一个 (last=True) 有效值"""
+    n = len(values)
+    pos = np.arange(n)
+    if last:
+        idx = np.maximum.reduceat(np.where(valid, pos, -1), starts)
+        ok = idx >= 0
+    else:
+        idx = np.minimum.reduceat(np.where(valid, pos, n), starts)
+        ok = idx < n
+    return np.where(ok, values[np.clip(idx, 0, n - 1)], np.nan)
+
+
+def _column(df, col):
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    arr = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.where(np.isfinite(arr), arr, np.nan)
+
+
+def _dtype(df, col, default=np.float64):
+    """输出列沿用源列的紧凑类型 (见 schema.py)，源列不存在时使用 default"""
+    return df[col].dtype if col in df.columns and df[col].dtype.kind in "fi" else default
+
+
+def build_rollup(df, seconds):
+    """
+    把按 timestamp 升序排列的分钟数据聚合到 seconds 粒度
+    输出列与原始表同名，便于查询代码复用：
+      binance_open/high/low/close  OHLC (首个/最大/最小/最后一个有效值)
+      binance_volume, uniswap_total_volume_eth, uniswap_swap_count  求和
+      uniswap_avg_price            有效 DEX 价格 (>0) 的均值
+      price_difference             桶内绝对值最大的价差 (保留符号，避免抹掉尖峰)
+      spread_min / spread_max      桶内价差极值
+      price_ratio                  有效 DEX 分钟的价格比均值
+      spread_z                     桶内 |价差 / 标准差| 的最大值
+    timestamp、成交量、计数、价格比保持源列类型，spread_z 为 float64
+    """
+    if df.empty:
+        return pd.DataFrame(columns=["timestamp"])
+
+    ts = df["timestamp"].to_numpy(dtype=np.int64)
+    keys = ts // seconds
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+
+    cex = _column(df, "binance_close")
+    dex = _column(df, "uniswap_avg_price")
+    diff = _column(df, "price_difference")
+    std = _column(df, "uniswap_price_std")
+
+    cex_valid = ~np.isnan(cex)
+    dex_valid = ~np.isnan(dex) & (np.nan_to_num(dex) > 0)
+    spread = np.where(dex_valid, diff, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where((np.nan_to_num(std) != 0), np.abs(diff / std), 0.0)
+    z = np.where(dex_valid, z, np.nan)
+
+    # fmax/fmin 会忽略 NaN，整段均为 NaN 时结果为 NaN
+    spread_max = np.fmax.reduceat(spread, starts)
+    spread_min = np.fmin.reduceat(spread, starts)
+    absmax = np.where(np.abs(np.nan_to_num(spread_max)) >= np.abs(np.nan_to_num(spread_min)),
+                      spread_max, spread_min)
+
+    return pd.DataFrame({
+        "timestamp": (keys[starts] * seconds).astype(_dtype(df, "timestamp", np.int64)),
+        "binance_open": _segment_pick(_column(df, "binance_open"), cex_valid, starts, last=False),
+        "binance_high": np.fmax.reduceat(_column(df, "binance_high"), starts),
+        "binance_low": np.fmin.reduceat(_column(df, "binance_low"), starts),
+        "binance_close": _segment_pick(cex, cex_valid, starts, last=True),
+        "binance_volume": np.add.reduceat(
+            np.nan_to_num(_column(df, "binance_volume")), starts).astype(_dtype(df, "binance_volume")),
+        "uniswap_avg_price": _segment_mean(dex, dex_valid, starts),
+        "uniswap_total_volume_eth": np.add.reduceat(
+            np.nan_to_num(_column(df, "uniswap_total_volume_eth")), starts
+        ).astype(_dtype(df, "uniswap_total_volume_eth")),
+        "uniswap_swap_count": np.add.reduceat(
+            np.nan_to_num(_column(df, "uniswap_swap_count")), starts
+        ).astype(_dtype(df, "uniswap_swap_count", np.int64)),
+        "price_difference": absmax,
+        "spread_min": spread_min,
+        "spread_max": spread_max,
+        "price_ratio": _segment_mean(_column(df, "price_ratio"), dex_valid, starts
+                                     ).astype(_dtype(df, "price_ratio")),
+        "spread_z": np.fmax.reduceat(z, starts),
+    })
+
+
+def build_pyramid(df, levels):
+    """按 levels (如 ['1m', '5m', ...]) 构建各级 rollup，返回 {秒数: (DataFrame, 时间索引)}"""
+    pyramid = {}
+    for level in levels:
+        seconds = parse_interval(level)
+        frame = build_rollup(df, seconds)
+        pyramid[seconds] = (frame, frame["timestamp"].to_numpy())
+    return pyramid
+
+
+def _allowed_levels(pyramid, min_seconds):
+    """不细于 min_seconds 的级别 (升序)；interval 比所有级别都粗时使用最粗级别"""
+    return sorted(s for s in pyramid if s >= min_seconds) or [max(pyramid)]
+
+
+def finest_level(pyramid, min_seconds):
+    """满足 interval 下限的最细级别 (导出全部数据时使用，不按点数上限放粗)"""
+    return _allowed_levels(pyramid, min_seconds)[0]
+
+
+def choose_level(pyramid, start_ts, end_ts, min_seconds, limit):
+    """
+    选择满足 interval 下限的最粗级别，且其在区间内仍有至少 limit 个点；
+    若所有级别都不足 limit 个点，则使用允许的最细级别
+    """
+    allowed = _allowed_levels(pyramid, min_seconds)
+    for seconds in reversed(allowed):
+        ts = pyramid[seconds][1]
+        count = np.searchsorted(ts, end_ts, side="right") - np.searchsorted(ts, start_ts, side="left")
+        if count >= limit:
+            return seconds
+    return allowed[0]
@@ -0,0 +1,100 @@
+"""
+装载数据的紧凑列类型 (schema)
+CSV 默认读取为 float64 / int64 / object，这里显式指定每列类型并丢弃 service 不读取的列：
+  价格与价差      float64  (4000+ 的价格需要 float64 才能保留到小数点后 4 位)
+  价格比、标准差  float64  (spreadPct 与 z 直接输出并参与阈值比较，与 CSV 中的值保持一致)
+  成交量、信号净利  float32
+  计数、id        int32
+  timestamp       int32 秒 (可表示到 2038 年，超出范围时保留 int64)
+  direction       category
+float32 列输出 JSON 时按最短十进制表示转换 (见 service._nullable_list)，不会出现 0.10000000149 这样的值。
+"""
+import numpy as np
+import pandas as pd
+
+DATA_SCHEMA = {
+    "timestamp": "int32",
+    "binance_open": "float64",
+    "binance_high": "float64",
+    "binance_low": "float64",
+    "binance_close": "float64",
+    "binance_volume": "float32",
+    "uniswap_avg_price": "float64",
+    "uniswap_total_volume_eth": "float32",
+    "uniswap_swap_count": "int32",
+    "uniswap_price_std": "float64",
+    "price_difference": "float64",
+    "price_ratio": "float64",
+}
+
+SIGNALS_SCHEMA = {
+    "id": "int32",
+    "timestamp": "int32",
+    "direction": "category",
+    # 阈值比较依赖 zscore 的全部有效数字，保留 float64
+    "zscore": "float64",
+    "net_profit": "float32",
+    "uniswap_avg_price": "float64",
+    "binance_close_price": "float64",
+    "price_difference": "float64",
+}
+
+_INT32 = np.iinfo(np.int32)
+
+
+def read_csv(path, schema):
+    """只读取 schema 中的列；浮点列直接按目标类型解析，整数列解析后再转换 (可能含缺失值)"""
+    dtype = {col: t for col, t in schema.items() if t.startswith("float") or t == "category"}
+    return apply(pd.read_csv(path, usecols=lambda col: col in schema, dtype=dtype), schema)
+
+
+def _cast_int(series, dtype):
+    """整数列：含缺失值时保持浮点 (无法用整数表示)，超出 int32 范围时使用 int64"""
+    if series.isna().any():
+        return series
+    if dtype == "int32" and len(series) and not (_INT32.min <= series.min() and series.max() <= _INT32.max):
+        dtype = "int64"
+    return series if series.dtype == dtype else series.astype(dtype)
+
+
+def apply(df, schema):
+    """
+    按 schema 转换列类型并丢弃其余列 (原表不变)；缺失 timestamp 的行无法进入时间索引，一并丢弃
+    已经符合 schema 的列不复制
+    """
+    df = df[[col for col in df.columns if col in schema]]
+    if "timestamp" in df.columns and df["timestamp"].isna().any():
+        df = df[df["timestamp"].notna()]
+    columns = {}
+    for col in df.columns:
+        dtype = schema[col]
+        series = df[col]
+        if dtype.startswith("int"):
+            columns[col] = _cast_int(series, dtype)
+        elif dtype == "category":
+            columns[col] = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+        else:
+            columns[col] = series if series.dtype == dtype else series.astype(dtype)
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def memory_report(parts):
+    """
+    按表统计内存占用 (字节)，parts 为 service.build_parts / data_store.read_store 的返回值
+    mmap 打开的存储统计的是映射大小，实际驻留内存按访问的页计算
+    """
+    def table_bytes(df, ts):
+        size = int(df.memory_usage(index=False, deep=True).sum()) if len(df.columns) else 0
+        # 时间索引通常直接引用 timestamp 列，不重复计算
+        if "timestamp" not in df.columns or not np.shares_memory(ts, df["timestamp"].to_numpy()):
+            size += ts.nbytes
+        return size
+
+    report = {
+        "data": table_bytes(parts["df_data"], parts["data_ts"]),
+        "signals": table_bytes(parts["df_signals"], parts["signals_ts"]),
+        "rollups": sum(table_bytes(frame, ts) for frame, ts in parts["rollups"].values()),
+        "calendar": parts["data_calendar"].nbytes + parts["signals_calendar"].nbytes,
+    }
+    report["total"] = sum(report.values())
+    return report
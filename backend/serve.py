@@ -0,0 +1,177 @@
+"""
+多进程部署：预先 fork N 个工作进程，共享同一个监听端口与同一份只读数据
+运行: python serve.py [--workers N] [--host HOST] [--port PORT]
+
+- 主进程绑定端口后 fork 工作进程，各进程在同一个 socket 上 accept，由内核分配连接
+- 数据以列式存储 (data_store.py) 的 mmap 方式打开：各进程映射同一组文件，物理内存中只有页缓存里的一份，
+  总内存约为一份数据加上每个进程自己的解释器与结果缓存
+- 启动时若存储不存在或已过期，主进程先转换 CSV (在子进程中执行，主进程不持有数据)；
+  运行期间主进程监视 CSV，变化并稳定后重新生成存储，工作进程只监视存储的 manifest 并重新映射，
+  不会各自读取一份 CSV
+- 工作进程异常退出时由主进程重新启动；SIGTERM / Ctrl-C 时通知全部工作进程退出
+仅支持 POSIX (os.fork)；其他平台请使用 python api.py
+"""
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import config
+import data_store
+
+
+def _sources():
+    return [config.DATA_CSV_PATH, config.SIGNALS_CSV_PATH]
+
+
+def _stamps(paths):
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps.append((st.st_size, st.st_mtime))
+        except OSError:
+            stamps.append(None)
+    return stamps
+
+
+def ensure_store():
+    """
+    存储不存在或已过期、且 CSV 都存在时重新转换；返回存储是否可用
+    CSV 不全时不能转换：与当前配置一致的存储仍可使用 (不检查是否过期)
+    """
+    if data_store.is_fresh(config.DATA_STORE_DIR, _sources()):
+        return True
+    if not all(os.path.exists(path) for path in _sources()):
+        usable = data_store.is_compatible(config.DATA_STORE_DIR)
+        print(f"[Warn] CSV files are not available, data store {config.DATA_STORE_DIR} "
+              + ("used without freshness check" if usable else "is missing or built with other settings"))
+        return usable
+    print(f"[System] Converting CSV into data store {config.DATA_STORE_DIR}...")
+    result = subprocess.run([sys.executable, os.path.abspath(data_store.__file__),
+                             "--data", config.DATA_CSV_PATH, "--signals", config.SIGNALS_CSV_PATH,
+                             "--out", config.DATA_STORE_DIR])
+    return result.returncode == 0
+
+
+def _run_worker(sock):
+    """工作进程：mmap 装载数据，在继承的 socket 上运行多线程 WSGI 服务"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)      # Ctrl-C 由主进程统一处理
+    # 各工作进程写入各自的 trace 文件，避免多个进程轮转同一个文件
+    root, ext = os.path.splitext(config.TRACE_FILE)
+    config.TRACE_FILE = f"{root}.{os.getpid()}{ext}"
+    from werkzeug.serving import make_server
+
+    import api
+    import service
+
+    loader = service.data_loader
+    loader.start_background_load()
+    if config.HOT_RELOAD:
+        loader.start_watcher(paths=[os.path.join(config.DATA_STORE_DIR, data_store.MANIFEST)])
+    api.quiet_server_log()
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, api.app, threaded=True, fd=sock.fileno())
+    print(f"[System] Worker {os.getpid()} serving on {host}:{port}")
+    server.serve_forever()
+
+
+def _spawn(sock):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock)
+        except BaseException as e:
+            print(f"[Error] Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(workers, host, port):
+    # 在 fork 之前导入 api / service (不装载数据)，工作进程共享这些模块的内存页
+    import api  # noqa: F401
+    import auth
+    import service  # noqa: F401
+
+    auth.init_db()
+    auth.init_default_user()
+    ensure_store()
+
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    # 数据与后台线程都在 fork 之后才启动
+
+    children = {_spawn(sock) for _ in range(workers)}
+    print(f"[System] Serving on {host}:{port} with {workers} workers (pid {os.getpid()})")
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    watched = _sources()
+    loaded, pending = _stamps(watched), None
+    next_poll = time.monotonic() + config.RELOAD_POLL_SECONDS
+    while not stopping:
+        time.sleep(0.5)
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid == 0:
+                break
+            children.discard(pid)
+            if not stopping:
+                print(f"[Warn] Worker {pid} exited, restarting")
+                children.add(_spawn(sock))
+
+        if config.HOT_RELOAD and time.monotonic() >= next_poll:
+            next_poll = time.monotonic() + config.RELOAD_POLL_SECONDS
+            current = _stamps(watched)
+            if current == loaded:
+                pending = None
+            elif current == pending:
+                loaded, pending = current, None
+                ensure_store()            # 工作进程监视 manifest，随后各自重新映射
+            else:
+                pending = current
+
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked worker processes")
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS or os.cpu_count() or 1)
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--port", type=int, default=config.PORT)
+    parser.add_argument("--data", default=config.DATA_CSV_PATH)
+    parser.add_argument("--signals", default=config.SIGNALS_CSV_PATH)
+    parser.add_argument("--store", default=config.DATA_STORE_DIR)
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py requires os.fork; use python api.py on this platform")
+    config.DATA_CSV_PATH, config.SIGNALS_CSV_PATH = args.data, args.signals
+    config.DATA_STORE_DIR = args.store
+    serve(max(1, args.workers), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
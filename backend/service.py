@@ -1,30 +1,352 @@
+import contextlib
+import contextvars
+import functools
+import itertools
+import hashlib
+import os
+import threading
+import time
 import pandas as pd
 import numpy as np
-import random
 import config
+from cache import ResultCache
+import rollup
+import downsample
+import backtest
+import data_store
+import schema
+import tracing
+
+# 查询结果缓存，键中包含数据版本号，数据重新加载后旧结果自动失效
+result_cache = ResultCache(config.CACHE_MAX_ENTRIES, config.CACHE_MAX_BYTES)
+
+# DataLoader.pinned() 期间 snapshot() 返回的快照 (按线程 / 上下文隔离)
+_pinned = contextvars.ContextVar("pinned_snapshot", default=None)
+
+class DataSnapshot:
+    """
+    一次装载得到的只读数据快照
+    请求开始时取得快照并全程使用，热加载替换快照不会影响进行中的请求
+    """
+    def __init__(self, parts, version, source, stamps=None):
+        self.version = version
+        self.source = source
+        self.loaded_at = time.time()
+        # 数据指纹：从文件装载时由源文件的大小与修改时间得到，重启或多个进程装载同一份文件时相同，
+        # 用于生成 HTTP ETag；直接装载 DataFrame 时每次装载都不同
+        seed = (source, stamps) if stamps is not None else (source, version, self.loaded_at)
+        self.fingerprint = hashlib.sha1(repr(seed).encode()).hexdigest()[:16]
+        self.df_data, self.data_ts = parts["df_data"], parts["data_ts"]
+        self.df_signals, self.signals_ts = parts["df_signals"], parts["signals_ts"]
+        self.rollups = parts["rollups"]
+        self.data_calendar = parts["data_calendar"]
+        self.signals_calendar = parts["signals_calendar"]
+        self.memory = schema.memory_report(parts)
+
+    def _slice(self, table, df, ts_index, start_ts, end_ts):
+        with tracing.span("slice", table=table) as s:
+            df = _filter_df(df, ts_index, start_ts, end_ts)
+            s.set(rows=len(df))
+        return df
+
+    def slice_data(self, start_ts, end_ts):
+        return self._slice("data", self.df_data, self.data_ts, start_ts, end_ts)
+
+    def slice_signals(self, start_ts, end_ts):
+        return self._slice("signals", self.df_signals, self.signals_ts, start_ts, end_ts)
+
+    def slice_rollup(self, start_ts, end_ts, interval, limit):
+        """选取不细于 interval、且区间内仍有约 limit 个点的最粗 rollup 级别并切片"""
+        if self.df_data.empty: return self.df_data
+        seconds = rollup.choose_level(self.rollups, start_ts, end_ts,
+                                      rollup.parse_interval(interval), limit)
+        frame, ts_index = self.rollups[seconds]
+        return self._slice(f"rollup_{seconds}s", frame, ts_index, start_ts, end_ts)
+
+    def slice_interval(self, start_ts, end_ts, interval):
+        """按 interval 对应的最细 rollup 级别切片 (不降采样，用于批量导出)"""
+        if self.df_data.empty: return self.df_data
+        seconds = rollup.finest_level(self.rollups, rollup.parse_interval(interval))
+        frame, ts_index = self.rollups[seconds]
+        return self._slice(f"rollup_{seconds}s", frame, ts_index, start_ts, end_ts)
+
+def _read_parts():
+    """按启动规则读取数据：列式存储存在且未过期时 mmap 打开，否则读取 CSV"""
+    sources = [config.DATA_CSV_PATH, config.SIGNALS_CSV_PATH]
+    csv_missing = not any(os.path.exists(path) for path in sources)
+    if data_store.is_fresh(config.DATA_STORE_DIR, sources) or (
+            csv_missing and data_store.is_compatible(config.DATA_STORE_DIR)):
+        if csv_missing:
+            print(f"[Warn] CSV files not found, using data store {config.DATA_STORE_DIR} without freshness check")
+        print(f"[System] Memory-mapping data store {config.DATA_STORE_DIR}...")
+        try:
+            return data_store.read_store(config.DATA_STORE_DIR), "store"
+        except Exception as e:
+            print(f"[Error] Failed to open data store: {e}")
+    print("[System] Loading CSV data into memory...")
+    try:
+        df_data = schema.read_csv(config.DATA_CSV_PATH, schema.DATA_SCHEMA)
+        df_signals = schema.read_csv(config.SIGNALS_CSV_PATH, schema.SIGNALS_SCHEMA)
+    except Exception as e:
+        print(f"[Error] Failed to load CSV: {e}")
+        df_data = pd.DataFrame()
+        df_signals = pd.DataFrame()
+    return build_parts(df_data, df_signals), "csv"
+
+def _watched_files():
+    return [config.DATA_CSV_PATH, config.SIGNALS_CSV_PATH,
+            os.path.join(config.DATA_STORE_DIR, data_store.MANIFEST)]
+
+def _file_stamps(paths):
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamps.append((st.st_size, st.st_mtime))
+        except OSError:
+            stamps.append(None)
+    return stamps
 
 class DataLoader:
+    """
+    进程级数据装载器 (双缓冲)：当前快照对外只读，新快照在后台线程构建完成后
+    一次性替换引用，替换前的请求继续使用旧快照，替换后的请求看到新数据
+    创建时不读取数据：start_background_load() 在后台装载，ready 表示首个快照已就绪；
+    未就绪时调用 snapshot() 会等待装载完成 (必要时在当前线程装载)
+    """
     _instance = None
+    _create_lock = threading.Lock()
     
     def __new__(cls):
-        if cls._instance is None:
-            print("[System] Loading CSV data into memory...")
-            cls._instance = super(DataLoader, cls).__new__(cls)
-            try:
-                cls._instance.df_data = pd.read_csv(config.DATA_CSV_PATH)
-                cls._instance.df_signals = pd.read_csv(config.SIGNALS_CSV_PATH)
-            except Exception as e:
-                print(f"[Error] Failed to load CSV: {e}")
-                cls._instance.df_data = pd.DataFrame()
-                cls._instance.df_signals = pd.DataFrame()
+        with cls._create_lock:
+            if cls._instance is None:
+                instance = super(DataLoader, cls).__new__(cls)
+                instance._swap_lock = threading.Lock()
+                instance._ready = threading.Event()
+                instance._reload_thread = None
+                instance._watcher = None
+                instance.last_error = None
+                instance._snapshot = None
+                cls._instance = instance
         return cls._instance
 
+    def __getattr__(self, name):
+        # df_data / data_ts / slice_data 等直接读取当前快照
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.snapshot(), name)
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start_background_load(self):
+        """在后台线程装载首个快照 (已就绪或正在装载时不重复启动)"""
+        if not self.ready:
+            self.reload_async()
+
+    def snapshot(self):
+        pinned = _pinned.get()
+        if pinned is not None:
+            return pinned
+        if not self._ready.is_set():
+            self.start_background_load()
+            self._ready.wait()
+        return self._snapshot
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """
+        with 块内 snapshot() 固定返回进入时的快照：一次查询中的多次读取 (缓存键、ETag、嵌套的缓存函数)
+        使用同一版本的数据，期间发生的替换不会让结果混合两个版本
+        """
+        token = _pinned.set(self.snapshot())
+        try:
+            yield _pinned.get()
+        finally:
+            _pinned.reset(token)
+
+    @property
+    def version(self):
+        return self.snapshot().version
+
+    def load_frames(self, df_data, df_signals):
+        """装载 DataFrame，排序并构建时间索引、rollup 与日历键"""
+        self._swap(build_parts(df_data, df_signals), "frames")
+
+    def load_store(self, store_dir):
+        """以 mmap 方式装载列式存储 (见 data_store.py)，派生结构直接从存储读取"""
+        stamps = _file_stamps([os.path.join(store_dir, data_store.MANIFEST)])
+        self._swap(data_store.read_store(store_dir), "store", stamps)
+
+    def _swap(self, parts, source, stamps=None):
+        with self._swap_lock:
+            version = self._snapshot.version + 1 if self._snapshot else 1
+            self._snapshot = snap = DataSnapshot(parts, version, source, stamps)
+        self._ready.set()
+        result_cache.clear()
+        memory = snap.memory
+        print(f"[System] Data snapshot v{version} ready ({source}), "
+              + ", ".join(f"{name} {size / 2 ** 20:.1f}MB" for name, size in memory.items()))
+
+    def reload(self):
+        """同步重新读取数据文件并替换快照；失败时保留旧快照 (首次装载失败时使用空数据)"""
+        try:
+            # 在读取前记录文件状态：读取期间文件被修改时，下一次装载会得到不同的指纹
+            stamps = _file_stamps(_watched_files())
+            self._swap(*_read_parts(), stamps)
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"[Error] Data reload failed: {e}")
+            if self._snapshot is None:
+                self._swap(build_parts(pd.DataFrame(), pd.DataFrame()), "empty")
+            return False
+
+    def reload_async(self):
+        """在后台线程重新装载；已有重新装载在进行时不重复启动，返回是否启动了新的装载"""
+        with self._swap_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self._reload_thread = threading.Thread(target=self.reload, name="data-reload", daemon=True)
+            self._reload_thread.start()
+            return True
+
+    def wait_reload(self, timeout=None):
+        thread = self._reload_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def start_watcher(self, interval=None, paths=None):
+        """
+        启动文件监视线程：CSV 或列式存储 manifest (或 paths 指定的文件) 发生变化，
+        且连续两次轮询保持不变 (避免读取写了一半的文件) 后触发后台重新装载
+        """
+        if self._watcher is not None:
+            return
+        interval = interval or config.RELOAD_POLL_SECONDS
+        paths = paths or _watched_files()
+
+        def watch():
+            loaded = _file_stamps(paths)
+            pending = None
+            while True:
+                time.sleep(interval)
+                current = _file_stamps(paths)
+                if current == loaded:
+                    pending = None
+                elif current == pending:
+                    loaded, pending = current, None
+                    self.reload()
+                else:
+                    pending = current
+
+        self._watcher = threading.Thread(target=watch, name="data-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self):
+        thread = self._reload_thread
+        if not self.ready:
+            return {"ready": False, "reloading": thread is not None and thread.is_alive(),
+                    "lastError": self.last_error}
+        snap = self._snapshot
+        return {
+            "ready": True,
+            "version": snap.version,
+            "fingerprint": snap.fingerprint,
+            "source": snap.source,
+            "loadedAt": int(snap.loaded_at),
+            "dataRows": len(snap.df_data),
+            "signalRows": len(snap.df_signals),
+            "memory": snap.memory,
+            "reloading": thread is not None and thread.is_alive(),
+            "lastError": self.last_error,
+        }
+
+def build_parts(df_data, df_signals):
+    """
+    由原始表构建 DataLoader 所需的全部结构：
+    按 schema 转换列类型、按 timestamp 升序排列的表及其时间索引 (即 timestamp 列)、
+    rollup 金字塔、日历分桶键
+    """
+    df_data, data_ts = _sort_by_time(schema.apply(df_data, schema.DATA_SCHEMA))
+    df_signals, signals_ts = _sort_by_time(schema.apply(df_signals, schema.SIGNALS_SCHEMA), tiebreak='id')
+    return {
+        "df_data": df_data,
+        "data_ts": data_ts,
+        "df_signals": df_signals,
+        "signals_ts": signals_ts,
+        "rollups": rollup.build_pyramid(df_data, config.ROLLUP_LEVELS),
+        "data_calendar": _calendar_keys(data_ts),
+        "signals_calendar": _calendar_keys(signals_ts),
+    }
+
+def _calendar_keys(ts_index):
+    """
+    预计算日历分桶键 = 星期 * 24 + 小时 (本地时区，星期 0=周日，与前端 getDay 一致)
+    1970-01-01 是周四，因此星期 = (天数 + 4) % 7
+    """
+    local = ts_index + config.TIMEZONE_OFFSET_HOURS * 3600
+    days = local // 86400
+    return (((days + 4) % 7) * 24 + (local % 86400) // 3600).astype(np.int16)
+
+def _sort_by_time(df, tiebreak=None):
+    """
+    按 timestamp 稳定排序，丢弃缺失时间戳的行，返回 (df, 时间索引)
+    tiebreak 列 (如信号 id) 存在时按 (timestamp, tiebreak) 排序，供键集分页使用
+    """
+    if df.empty or 'timestamp' not in df.columns:
+        return df, np.empty(0, dtype=np.int64)
+    df = df[df['timestamp'].notna()]
+    ts = df['timestamp'].to_numpy()
+    if tiebreak in df.columns:
+        key = df[tiebreak].to_numpy()
+        if len(ts) > 1 and ((np.diff(ts) < 0) | ((np.diff(ts) == 0) & (np.diff(key) < 0))).any():
+            df = df.iloc[np.lexsort((key, ts))]
+    elif len(ts) > 1 and (np.diff(ts) < 0).any():
+        df = df.iloc[np.argsort(ts, kind='stable')]
+    df = df.reset_index(drop=True)
+    ts = df['timestamp'].to_numpy()
+    return df, ts if ts.dtype.kind == 'i' else ts.astype(np.int64)
+
 data_loader = DataLoader()
 
-def _filter_df(df, start_ts, end_ts):
+def _time_bounds(ts_index, start_ts, end_ts):
+    """在有序时间索引上二分查找 [start_ts, end_ts]，返回下标区间 [lo, hi)"""
+    lo = np.searchsorted(ts_index, start_ts, side='left')
+    hi = np.searchsorted(ts_index, end_ts, side='right')
+    return lo, hi
+
+def _filter_df(df, ts_index, start_ts, end_ts):
+    """返回 [start_ts, end_ts] 对应的连续切片 (不复制数据)"""
     if df.empty: return df
-    mask = (df['timestamp'] >= start_ts) & (df['timestamp'] <= end_ts)
-    return df.loc[mask]
+    lo, hi = _time_bounds(ts_index, start_ts, end_ts)
+    return df.iloc[lo:hi]
+
+def _freeze(value):
+    """把列表参数转为 tuple，以便作为缓存键"""
+    return tuple(value) if isinstance(value, list) else value
+
+def cached(name):
+    """按 (接口名, 数据版本, 参数) 缓存函数结果，并合并并发的相同请求"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # 计算期间固定快照：结果与键中的版本一致
+            with data_loader.pinned() as snap, tracing.span("cache", function=name) as s:
+                key = (name, snap.version,
+                       tuple(_freeze(a) for a in args),
+                       tuple(sorted((k, _freeze(v)) for k, v in kwargs.items())))
+
+                def compute():
+                    s.set(hit=False)
+                    return func(*args, **kwargs)
+                s.set(hit=True)
+                return result_cache.get_or_compute(key, compute)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
 
 def _safe_float(val):
     """辅助函数：处理 NaN，转为 None 以便前端 JSON 解析"""
@@ -32,180 +354,446 @@ def _safe_float(val):
         return None
     return float(val)
 
-def get_price_data(start_ts, end_ts, interval='15m'):
-    df = _filter_df(data_loader.df_data, start_ts, end_ts)
-    if df.empty: return { "cex": [], "dex": [] }
+def _float_column(df, col):
+    """取出一列为浮点数组 (float32 列保持 float32，其余为 float64)，缺失列、NaN 和 inf 统一记为 NaN"""
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    dtype = np.float32 if df[col].dtype == np.float32 else np.float64
+    arr = df[col].to_numpy(dtype=dtype, na_value=np.nan)
+    return np.where(np.isfinite(arr), arr, np.nan)
 
-    total_points = len(df)
-    limit = 1000 
-    step = max(1, total_points // limit)
-    sampled_df = df.iloc[::step]
-    
-    cex_data = []
-    dex_data = []
-    
-    for _, row in sampled_df.iterrows():
-        ts = int(row['timestamp'])
-        cex_p = _safe_float(row.get('binance_close'))
-        dex_p = _safe_float(row.get('uniswap_avg_price'))
-        
-        if cex_p is not None:
-            cex_data.append({
-                "t": ts, "p": cex_p, 
-                "v": _safe_float(row.get('binance_volume')), 
-                "lat_ms": random.randint(10, 50)
-            })
-        
-        if dex_p is not None and dex_p > 0:
-            dex_data.append({
-                "t": ts, "p": dex_p, 
-                "v": _safe_float(row.get('uniswap_total_volume_eth')), 
-                "lat_ms": random.randint(10, 50)
-            })
-
-    return { "cex": cex_data, "dex": dex_data }
-
-def get_spread_data(start_ts, end_ts, interval='15m'):
-    df = _filter_df(data_loader.df_data, start_ts, end_ts)
-    limit = 1000
-    step = max(1, len(df) // limit)
-    sampled_df = df.iloc[::step]
-
-    mock_data = []
-    for _, row in sampled_df.iterrows():
-        ts = int(row['timestamp'])
-        dex_p = row.get('uniswap_avg_price')
-        
-        # 严格过滤 NaN
-        if pd.isna(dex_p) or dex_p == 0: continue
-
-        std = row.get('uniswap_price_std', 0)
-        diff = row.get('price_difference', 0)
-        z_val = abs(diff / std) if std and std != 0 and not pd.isna(std) else 0
-
-        mock_data.append({
-            "t": ts,
-            "spread": _safe_float(diff),
-            "spreadPct": _safe_float(row.get('price_ratio')),
-            "z": _safe_float(z_val),
-            "cexPrice": _safe_float(row.get('binance_close')),
-            "dexPrice": _safe_float(dex_p)
-        })
-        
-    return mock_data
-
-def get_heatmap_data(start_ts, end_ts):
-    mock_data = []
-    for hour in range(24):
-        for day in range(7):
-            mock_data.append([day, hour, round(random.random() * 5, 2)])
-    return mock_data
-
-def get_correlation_data(start_ts, end_ts):
-    mock_data = []
-    for lag in range(20):
-        mock_data.append({
-            "lag": lag,
-            "correlation": round(0.95 * (0.9 ** lag), 3)
-        })
-    return mock_data
+def _nullable_list(arr):
+    """float 数组转为 Python list，NaN 位置转为 None (与 _safe_float 一致)"""
+    if arr.dtype == np.float32:
+        # 直接转 float64 会带出二进制误差 (0.1 -> 0.10000000149)，经最短十进制表示转换
+        arr = arr.astype(str).astype(np.float64)
+    out = arr.tolist()
+    for i in np.flatnonzero(np.isnan(arr)).tolist():
+        out[i] = None
+    return out
+
+def _keep_all(x, y):
+    return np.arange(len(x))
+
+def _make_sampler(method, width, limit):
+    """返回 sampler(x, y) -> 选中下标，method 取值见 downsample.METHODS"""
+    if method not in downsample.METHODS:
+        raise ValueError(f"Unknown downsample method: {method}")
+    return lambda x, y: downsample.select(x, y, method, width, limit)
+
+def _price_points(ts, price, volume, mask, sampler):
+    """按掩码取出有效价格点并降采样，返回列字典 {t, p, v, lat_ms} (各列为 list)"""
+    idx = np.flatnonzero(mask)
+    idx = idx[sampler(ts[idx], price[idx])]
+    return {
+        "t": ts[idx].tolist(),
+        "p": price[idx].tolist(),
+        "v": _nullable_list(volume[idx]),
+        "lat_ms": np.random.randint(10, 51, size=len(idx)).tolist(),
+    }
+
+def _price_rows(cols):
+    return [{"t": t_, "p": p_, "v": v_, "lat_ms": l_}
+            for t_, p_, v_, l_ in zip(cols["t"], cols["p"], cols["v"], cols["lat_ms"])]
+
+def _build_price_series(df, sampler=_keep_all, fmt='rows'):
+    """
+    列式构建 CEX/DEX 价格序列：NaN/inf 过滤、CEX/DEX 拆分与降采样均为数组运算
+    fmt='columnar' 时直接返回各列数组，不再组装逐点字典
+    """
+    ts = df['timestamp'].to_numpy(dtype=np.int64)
+    cex_p = _float_column(df, 'binance_close')
+    dex_p = _float_column(df, 'uniswap_avg_price')
+
+    cex_mask = ~np.isnan(cex_p)
+    dex_mask = ~np.isnan(dex_p) & (np.nan_to_num(dex_p) > 0)
+
+    series = {
+        "cex": _price_points(ts, cex_p, _float_column(df, 'binance_volume'), cex_mask, sampler),
+        "dex": _price_points(ts, dex_p, _float_column(df, 'uniswap_total_volume_eth'), dex_mask, sampler),
+    }
+    if fmt == 'columnar':
+        return series
+    return {side: _price_rows(cols) for side, cols in series.items()}
+
+# 图表接口的返回格式：rows 为逐点字典列表 (默认)，columnar 为各字段的并列数组
+RESPONSE_FORMATS = ("rows", "columnar")
+
+def _series_length(series):
+    """rows 格式为逐点列表，columnar 格式为列字典"""
+    return len(series["t"]) if isinstance(series, dict) else len(series)
 
+def _check_format(fmt):
+    if fmt not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown response format: {fmt}")
+
+@cached("price")
+def get_price_data(start_ts, end_ts, interval='15m', method='m4', width=None, fmt='rows'):
+    _check_format(fmt)
+    limit = config.MAX_CHART_POINTS
+    sampler = _make_sampler(method, width, limit)
+    df = data_loader.snapshot().slice_rollup(start_ts, end_ts, interval, limit)
+    if df.empty:
+        df = pd.DataFrame({"timestamp": np.empty(0, dtype=np.int64)})
+
+    with tracing.span("sample", method=method, rows=len(df)) as s:
+        series = _build_price_series(df, sampler, fmt)
+        s.set(points=sum(_series_length(side) for side in series.values()))
+    return series
+
+def _build_spread_series(df, sampler=_keep_all, fmt='rows'):
+    """列式构建价差序列：跳过 DEX 价格缺失或为 0 的桶，按价差曲线降采样"""
+    dex_p = _float_column(df, 'uniswap_avg_price')
+    diff = _float_column(df, 'price_difference')
+    ts = df['timestamp'].to_numpy(dtype=np.int64)
+
+    idx = np.flatnonzero(~np.isnan(dex_p) & (np.nan_to_num(dex_p) != 0))
+    idx = idx[sampler(ts[idx], np.nan_to_num(diff[idx]))]
+
+    cols = {
+        "t": ts[idx].tolist(),
+        "spread": _nullable_list(diff[idx]),
+        "spreadPct": _nullable_list(_float_column(df, 'price_ratio')[idx]),
+        "z": _nullable_list(_float_column(df, 'spread_z')[idx]),
+        "cexPrice": _nullable_list(_float_column(df, 'binance_close')[idx]),
+        "dexPrice": dex_p[idx].tolist(),
+    }
+    if fmt == 'columnar':
+        return cols
+    return [
+        {"t": t_, "spread": s_, "spreadPct": sp_, "z": z_, "cexPrice": c_, "dexPrice": d_}
+        for t_, s_, sp_, z_, c_, d_ in zip(*cols.values())
+    ]
+
+@cached("spread")
+def get_spread_data(start_ts, end_ts, interval='15m', method='m4', width=None, fmt='rows'):
+    _check_format(fmt)
+    limit = config.MAX_CHART_POINTS
+    sampler = _make_sampler(method, width, limit)
+    df = data_loader.snapshot().slice_rollup(start_ts, end_ts, interval, limit)
+    if df.empty:
+        df = pd.DataFrame({"timestamp": np.empty(0, dtype=np.int64)})
+
+    with tracing.span("sample", method=method, rows=len(df)) as s:
+        series = _build_spread_series(df, sampler, fmt)
+        s.set(points=_series_length(series))
+    return series
+
+# 批量导出的列：输出名 -> rollup 列名
+CHART_EXPORT_COLUMNS = {
+    "price": {"t": "timestamp", "cexPrice": "binance_close", "cexVolume": "binance_volume",
+              "dexPrice": "uniswap_avg_price", "dexVolume": "uniswap_total_volume_eth"},
+    "spread": {"t": "timestamp", "spread": "price_difference", "spreadPct": "price_ratio",
+               "z": "spread_z", "cexPrice": "binance_close", "dexPrice": "uniswap_avg_price"},
+}
+
+def get_chart_columns(start_ts, end_ts, interval, data_type):
+    """
+    price / spread 的全部数据 (不降采样)，返回 {输出列名: 数组}
+    数组直接引用 DataLoader 中 rollup 表的列 (切片视图，不复制)，缺失值为 NaN
+    """
+    df = data_loader.snapshot().slice_interval(start_ts, end_ts, interval)
+    return {name: (df[col].to_numpy() if col in df.columns else np.full(len(df), np.nan))
+            for name, col in CHART_EXPORT_COLUMNS[data_type].items()}
+
+DOWNSAMPLE_METHODS = downsample.METHODS
+HEATMAP_METRICS = ("spread", "count", "profit")
+
+@cached("heatmap")
+def get_heatmap_data(start_ts, end_ts, metric='spread', fmt='rows'):
+    """
+    星期 × 小时热力图，返回 [day, hour, value] 列表 (day: 0=周日)；
+    fmt='columnar' 时返回 {day: [], hour: [], value: []}，顺序相同
+    metric: spread  有 DEX 成交的分钟内 |price_difference| 均值
+            count   信号数量
+            profit  信号净利润合计 (USDT)
+    使用装载时预计算的日历键，对时间切片做 bincount，无需逐次 groupby
+    """
+    if metric not in HEATMAP_METRICS:
+        raise ValueError(f"Unknown heatmap metric: {metric}")
+    _check_format(fmt)
+    cells = 7 * 24
+
+    snap = data_loader.snapshot()
+
+    with tracing.span("heatmap", metric=metric) as s:
+        if metric == 'spread':
+            lo, hi = _time_bounds(snap.data_ts, start_ts, end_ts)
+            df = snap.df_data.iloc[lo:hi]
+            keys = snap.data_calendar[lo:hi]
+            dex_p = _float_column(df, 'uniswap_avg_price')
+            diff = np.abs(_float_column(df, 'price_difference'))
+            valid = (np.nan_to_num(dex_p) > 0) & ~np.isnan(diff)
+            total = np.bincount(keys[valid], weights=diff[valid], minlength=cells)
+            count = np.bincount(keys[valid], minlength=cells)
+            values = np.round(np.divide(total, count, out=np.zeros(cells), where=count > 0), 2)
+        else:
+            lo, hi = _time_bounds(snap.signals_ts, start_ts, end_ts)
+            keys = snap.signals_calendar[lo:hi]
+            if metric == 'count':
+                values = np.bincount(keys, minlength=cells)
+            else:
+                profit = np.nan_to_num(_float_column(snap.df_signals.iloc[lo:hi], 'net_profit'))
+                values = np.round(np.bincount(keys, weights=profit, minlength=cells), 2)
+        s.set(rows=int(hi - lo))
+
+    # 输出顺序：小时在外层，星期在内层
+    order = (np.arange(7)[None, :] * 24 + np.arange(24)[:, None]).ravel()
+    cols = {"day": (order // 24).tolist(), "hour": (order % 24).tolist(), "value": values[order].tolist()}
+    if fmt == 'columnar':
+        return cols
+    return [list(cell) for cell in zip(*cols.values())]
+
+def _ffill(values):
+    """用最近一个有效值向前填充 NaN (开头的 NaN 保持不变)"""
+    valid = ~np.isnan(values)
+    idx = np.maximum.accumulate(np.where(valid, np.arange(len(values)), 0))
+    return values[idx]
+
+def _log_returns(prices):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.diff(np.log(prices))
+    return np.where(np.isfinite(returns), returns, 0.0)
+
+def _cross_correlation(a, b, max_lag):
+    """
+    FFT 计算标准化序列的互相关：corr[k] = mean(a[t] * b[t + k])，k ∈ [-max_lag, max_lag]
+    k > 0 表示 b 滞后于 a
+    """
+    n = len(a)
+    a = (a - a.mean()) / (a.std() or 1.0)
+    b = (b - b.mean()) / (b.std() or 1.0)
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    raw = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)
+    lags = np.arange(-max_lag, max_lag + 1)
+    return lags, raw[lags % size] / (n - np.abs(lags))
+
+@cached("correlation")
+def get_correlation_data(start_ts, end_ts, max_lag=None, fmt='rows'):
+    """
+    Binance 收盘价与 Uniswap 均价 (分钟) 收益率的领先-滞后互相关
+    fmt='columnar' 时 lags 为 {lag: [], correlation: []}
+    lag > 0：DEX 滞后于 CEX (CEX 领先)；lag < 0：CEX 滞后于 DEX
+    Uniswap 无成交的分钟沿用上一成交价，即该分钟收益率为 0
+    """
+    _check_format(fmt)
+    max_lag = config.CORRELATION_MAX_LAG if max_lag is None else max_lag
+    df = data_loader.snapshot().slice_data(start_ts, end_ts)
+    no_lags = {"lag": [], "correlation": []} if fmt == 'columnar' else []
+    empty = {"lags": no_lags, "peakLag": None, "peakCorrelation": None, "leader": None, "samples": 0}
+    if df.empty: return empty
+
+    with tracing.span("correlation", rows=len(df), max_lag=max_lag):
+        cex = _ffill(_float_column(df, 'binance_close'))
+        dex_p = _float_column(df, 'uniswap_avg_price')
+        dex = _ffill(np.where(np.nan_to_num(dex_p) > 0, dex_p, np.nan))
+        first = max(np.argmax(~np.isnan(cex)), np.argmax(~np.isnan(dex)))
+        cex_r, dex_r = _log_returns(cex[first:]), _log_returns(dex[first:])
+
+        max_lag = min(max_lag, len(cex_r) - 2)
+        if max_lag < 0 or np.isnan(cex[first:]).all() or np.isnan(dex[first:]).all():
+            return empty
+
+        lags, corr = _cross_correlation(cex_r, dex_r, max_lag)
+    peak = int(np.argmax(corr))
+    peak_lag = int(lags[peak])
+    lag_cols = {"lag": lags.tolist(), "correlation": np.round(corr, 4).tolist()}
+    return {
+        "lags": lag_cols if fmt == 'columnar' else
+                [{"lag": lag, "correlation": c} for lag, c in zip(*lag_cols.values())],
+        "peakLag": peak_lag,
+        "peakCorrelation": round(float(corr[peak]), 4),
+        "leader": "CEX" if peak_lag > 0 else "DEX" if peak_lag < 0 else "none",
+        "samples": len(cex_r),
+    }
+
+def _object_column(df, col, default):
+    if col not in df.columns:
+        return np.full(len(df), default, dtype=object)
+    return df[col].array
+
+def _trade_columns(df_sig, z_threshold, trade_size_usdt):
+    """对一段信号执行回测，返回 (逐笔结果列字典, 权益曲线, 汇总统计)"""
+    with tracing.span("backtest", signals=len(df_sig)) as s:
+        cols, bt_stats = backtest.run(df_sig, z_threshold, trade_size_usdt)
+        s.set(trades=len(cols["trades"]))
+    trades = cols["trades"]
+    n = len(trades)
+    columns = {
+        "id": trades['id'].to_numpy() if 'id' in trades.columns else np.arange(1, n + 1),
+        "time": trades['timestamp'].to_numpy(dtype=np.int64) if n else np.empty(0, dtype=np.int64),
+        "direction": _object_column(trades, 'direction', 'Long'),
+        "spread": _float_column(trades, 'price_difference'),
+        "spreadPct": np.where(np.isfinite(cols["spread_pct"]), cols["spread_pct"], np.nan),
+        "zScore": cols["zscore"],
+        "grossProfit": np.round(cols["gross_profit"], 2),
+        "totalCost": np.round(cols["total_cost"], 2),
+        "netProfit": np.round(cols["net_profit"], 2),
+        "confidence": np.round(cols["confidence"], 2),
+        "cexPrice": _float_column(trades, 'binance_close_price'),
+        "dexPrice": _float_column(trades, 'uniswap_avg_price'),
+    }
+    return columns, cols["equity"], bt_stats
+
+def get_trade_columns(start_ts, end_ts, z_threshold, trade_size_usdt):
+    """
+    执行回测，返回 (逐笔结果列字典, 权益曲线, 汇总统计)
+    列名与 run_backtest 中逐笔对象的字段一致，值为数组 (数值列直接来自回测结果，不转换为 Python 对象)
+    """
+    df_sig = data_loader.snapshot().slice_signals(start_ts, end_ts)
+    return _trade_columns(df_sig, z_threshold, trade_size_usdt)
+
+def _signal_rows(columns, trade_size_usdt, params):
+    """逐笔结果列 -> 信号字典列表：各列先整体转为 Python list，再 zip 组装 (避免逐行访问 DataFrame)"""
+    with tracing.span("build_rows", rows=len(columns["time"])):
+        return _build_signal_rows(columns, trade_size_usdt, params)
+
+def _build_signal_rows(columns, trade_size_usdt, params):
+    rows = zip(
+        [str(x) for x in columns["id"].tolist()], columns["time"].tolist(),
+        columns["direction"].tolist(),
+        _nullable_list(columns["spread"]),
+        _nullable_list(columns["spreadPct"]),
+        columns["zScore"].tolist(),
+        columns["grossProfit"].tolist(),
+        columns["totalCost"].tolist(),
+        columns["netProfit"].tolist(),
+        columns["confidence"].tolist(),
+        _nullable_list(columns["cexPrice"]),
+        _nullable_list(columns["dexPrice"]),
+    )
+    return [{
+        "id": id_, "time": t, "direction": d,
+        "spread": sp, "spreadPct": spp, "zScore": z,
+        "size": trade_size_usdt,
+        # [新增字段] 补全前端需求
+        "grossProfit": g, "totalCost": c, "netProfit": np_, "confidence": conf,
+        # ------------
+        "cexPrice": cex, "dexPrice": dex,
+        "params": params
+    } for id_, t, d, sp, spp, z, g, c, np_, conf, cex, dex in rows]
+
+def _keyset_start(snap, after_ts, after_id):
+    """第一个 (timestamp, id) 大于 (after_ts, after_id) 的信号下标 (信号按该键排序)"""
+    ts = snap.signals_ts
+    lo = int(np.searchsorted(ts, after_ts, side='left'))
+    hi = int(np.searchsorted(ts, after_ts, side='right'))
+    if 'id' not in snap.df_signals.columns:
+        return hi
+    ids = snap.df_signals['id'].to_numpy()[lo:hi]
+    return lo + int(np.searchsorted(ids, after_id, side='right'))
+
+def iter_signals(start_ts, end_ts, z_threshold, trade_size_usdt, after=None):
+    """
+    按 (timestamp, id) 顺序逐块回测并逐个产出信号字典，内存占用与区间长度无关
+    逐笔结果只依赖单个信号，分块计算与整体回测 (run_backtest) 的结果相同
+    after=(timestamp, id) 时从该信号之后开始 (键集分页)
+    快照在调用时取得 (而不是第一次迭代时)，流式响应与其 ETag 对应同一版本的数据
+    """
+    return _iter_signals(data_loader.snapshot(), start_ts, end_ts, z_threshold, trade_size_usdt, after)
+
+def _iter_signals(snap, start_ts, end_ts, z_threshold, trade_size_usdt, after):
+    lo, hi = _time_bounds(snap.signals_ts, start_ts, end_ts)
+    if after is not None:
+        lo = max(lo, _keyset_start(snap, *after))
+    params = {"zThreshold": z_threshold}
+    chunk = config.SIGNAL_STREAM_CHUNK_ROWS
+    for pos in range(lo, hi, chunk):
+        columns, _, _ = _trade_columns(snap.df_signals.iloc[pos:min(pos + chunk, hi)],
+                                       z_threshold, trade_size_usdt)
+        yield from _signal_rows(columns, trade_size_usdt, params)
+
+def get_signal_page(start_ts, end_ts, z_threshold, trade_size_usdt, after=None, limit=None):
+    """
+    一页信号：{"signals": [...], "next": "timestamp,id" | null}
+    next 为本页最后一条信号的键，作为下一页的 after 参数；没有更多信号时为 null
+    """
+    limit = limit or config.SIGNALS_PAGE_DEFAULT_LIMIT
+    items = list(itertools.islice(iter_signals(start_ts, end_ts, z_threshold, trade_size_usdt, after),
+                                  limit + 1))
+    page = items[:limit]
+    more = len(items) > limit
+    return {"signals": page, "next": f"{page[-1]['time']},{page[-1]['id']}" if more else None}
+
+def summarize_backtest(bt_stats):
+    """汇总统计按接口约定的精度取整"""
+    return {
+        "totalTrades": bt_stats["totalTrades"],
+        "winningTrades": bt_stats["winningTrades"],
+        "winRate": round(bt_stats["winRate"], 4),
+        "totalProfit": round(bt_stats["totalProfit"], 2),
+        "avgProfit": round(bt_stats["avgProfit"], 2),
+        "maxDrawdown": round(bt_stats["maxDrawdown"], 4),
+        "sharpeRatio": round(bt_stats["sharpeRatio"], 4),
+    }
+
+def _equity_curve(start_ts, trade_times, equity, max_points=None):
+    """权益曲线 [{time, equity}]，首点为区间起点；max_points 给定时按 M4 降采样"""
+    times = np.concatenate(([start_ts], trade_times)).astype(np.int64)
+    idx = downsample.select(times, equity, "m4", limit=max_points) if max_points else np.arange(len(times))
+    return [{"time": t, "equity": e} for t, e in zip(times[idx].tolist(), equity[idx].tolist())]
+
+@cached("backtest")
 def run_backtest(start_ts, end_ts, z_threshold, trade_size_usdt):
-    df_sig = _filter_df(data_loader.df_signals, start_ts, end_ts)
-    signals = []
-    
-    capital = 10000.0 
-    current_equity = capital
-    equity_curve = [{"time": start_ts, "equity": capital}]
-    
-    winning_trades = 0
-    total_trades_count = 0
-    total_profit = 0.0
-    
-    # 费率配置
-    FEE_RATE = 0.003 + 0.001 # 0.4%
-    GAS_COST = 50.0 # 假设每次 Gas 50U
-
-    for _, item in df_sig.iterrows():
-        z = abs(item.get('zscore', 0))
-        if pd.isna(z) or z < z_threshold: continue
-            
-        total_trades_count += 1
-        
-        # --- 收益核心计算逻辑 ---
-        spread_pct = abs(item.get('price_difference', 0)) / item.get('binance_close_price', 1)
-        
-        # 毛利 (Gross Profit) = 投入 * 价差百分比
-        gross_profit = trade_size_usdt * spread_pct
-        
-        # 成本 (Total Cost) = 手续费 + Gas
-        total_cost = (trade_size_usdt * FEE_RATE) + GAS_COST
-        
-        # 净利 (Net Profit)
-        net_profit = gross_profit - total_cost
-        
-        # --- 统计更新 ---
-        total_profit += net_profit
-        current_equity += net_profit
-        
-        if net_profit > 0: winning_trades += 1
-
-        # Mock 置信度：Z-score 越高置信度越高，映射到 0.5 - 0.99
-        confidence = min(0.99, 0.5 + (z / 10.0))
-
-        signals.append({
-            "id": str(item.get('id', total_trades_count)),
-            "time": int(item.get('timestamp')),
-            "direction": item.get('direction', 'Long'),
-            "spread": _safe_float(item.get('price_difference')),
-            "spreadPct": _safe_float(spread_pct),
-            "zScore": _safe_float(z),
-            "size": trade_size_usdt,
-            # [新增字段] 补全前端需求
-            "grossProfit": round(gross_profit, 2),
-            "totalCost": round(total_cost, 2),
-            "netProfit": round(net_profit, 2),
-            "confidence": round(confidence, 2),
-            # ------------
-            "cexPrice": _safe_float(item.get('binance_close_price')),
-            "dexPrice": _safe_float(item.get('uniswap_avg_price')),
-            "params": {"zThreshold": z_threshold}
-        })
-        
-        equity_curve.append({
-            "time": int(item.get('timestamp')),
-            "equity": round(current_equity, 2)
-        })
-
-    win_rate = winning_trades / total_trades_count if total_trades_count > 0 else 0
-    avg_profit = total_profit / total_trades_count if total_trades_count > 0 else 0
-    
-    # Max Drawdown
-    equity_values = [e['equity'] for e in equity_curve]
-    peak = equity_values[0]
-    max_drawdown = 0.0
-    for val in equity_values:
-        if val > peak: peak = val
-        dd = (peak - val) / peak
-        if dd > max_drawdown: max_drawdown = dd
-
-    # Sharpe Ratio
-    sharpe_ratio = 0
-    if len(equity_values) > 1:
-        returns = pd.Series(equity_values).pct_change().dropna()
-        if returns.std() != 0:
-            sharpe_ratio = returns.mean() / returns.std()
+    columns, equity, bt_stats = get_trade_columns(start_ts, end_ts, z_threshold, trade_size_usdt)
+    signals = _signal_rows(columns, trade_size_usdt, {"zThreshold": z_threshold})
+    equity_curve = _equity_curve(start_ts, columns["time"], equity)
 
+    # 逐笔信号只在第一个返回值中出现，stats 不再重复包含 (接口层按需组装，见 get_backtest_result)
     stats = {
-        "totalTrades": total_trades_count,
-        "winningTrades": winning_trades,
-        "winRate": round(win_rate, 4),
-        "totalProfit": round(total_profit, 2),
-        "avgProfit": round(avg_profit, 2),
-        "maxDrawdown": round(max_drawdown, 4),
-        "sharpeRatio": round(sharpe_ratio, 4),
+        **summarize_backtest(bt_stats),
         "equity": equity_curve,
-        "signals": signals 
     }
     
-    return signals, stats
\ No newline at end of file
+    return signals, stats
+
+# type=backtest 响应可选的组成部分 (fields 参数)
+BACKTEST_FIELDS = ("stats", "equity", "signals")
+
+@cached("backtest_view")
+def get_backtest_result(start_ts, end_ts, z_threshold, trade_size_usdt,
+                        fields=BACKTEST_FIELDS, equity_points=None):
+    """
+    按 fields 组装回测响应：stats 为汇总统计，equity 为权益曲线，signals 为逐笔信号
+    equity_points 给定时用 M4 把权益曲线降到不超过该点数 (保留每个区间的首尾与最高/最低点，回撤不会被抹平)
+    不请求 signals 时不生成逐笔字典
+    """
+    columns, equity, bt_stats = get_trade_columns(start_ts, end_ts, z_threshold, trade_size_usdt)
+    result = {}
+    if "stats" in fields:
+        result.update(summarize_backtest(bt_stats))
+    if "equity" in fields:
+        result["equity"] = _equity_curve(start_ts, columns["time"], equity, equity_points)
+    if "signals" in fields:
+        # 与 type=signals 共用 run_backtest 缓存中的同一个列表
+        result["signals"] = run_backtest(start_ts, end_ts, z_threshold, trade_size_usdt)[0]
+    return result
+
+@cached("sweep")
+def run_sweep(start_ts, end_ts, z_thresholds, trade_sizes):
+    """z 阈值 × 交易规模网格回测，矩阵按 [z 阈值][交易规模] 排列"""
+    df_sig = data_loader.snapshot().slice_signals(start_ts, end_ts)
+    with tracing.span("sweep", signals=len(df_sig), cells=len(z_thresholds) * len(trade_sizes)):
+        grid = backtest.sweep(df_sig, z_thresholds, trade_sizes)
+    return {
+        "zThresholds": list(z_thresholds),
+        "tradeSizes": list(trade_sizes),
+        "totalTrades": grid["totalTrades"].tolist(),
+        "totalProfit": np.round(grid["totalProfit"], 2).tolist(),
+        "winRate": np.round(grid["winRate"], 4).tolist(),
+        "maxDrawdown": np.round(grid["maxDrawdown"], 4).tolist(),
+        "sharpeRatio": np.round(grid["sharpeRatio"], 4).tolist(),
+    }
+
+def get_sweep_columns(start_ts, end_ts, z_thresholds, trade_sizes):
+    """参数扫描结果的长表形式：每个 (z 阈值, 交易规模) 组合一行"""
+    grid = run_sweep(start_ts, end_ts, z_thresholds, trade_sizes)
+    n_sizes = len(grid["tradeSizes"])
+    columns = {
+        "zThreshold": np.repeat(np.asarray(grid["zThresholds"], dtype=np.float64), n_sizes),
+        "tradeSize": np.tile(np.asarray(grid["tradeSizes"], dtype=np.float64), len(grid["zThresholds"])),
+        "totalTrades": np.repeat(np.asarray(grid["totalTrades"], dtype=np.int64), n_sizes),
+    }
+    for key in ("totalProfit", "winRate", "maxDrawdown", "sharpeRatio"):
+        columns[key] = np.asarray(grid[key], dtype=np.float64).ravel()
+    return columns
@@ -0,0 +1,113 @@
+"""
+AI 对话接口测试：本地模拟 LLM 服务 (可设置延迟)，验证连接复用、并发上限 (429) 与等待超时 (503)
+运行: python -m pytest -q test_ai.py
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ai_service
+import api
+import config
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.connections.add(self.client_address)
+        self.server.messages.append(payload["messages"][-1]["content"])
+        time.sleep(self.server.latency)
+        user = payload["messages"][-1]["content"]
+        body = json.dumps({"choices": [{"message": {"role": "assistant", "content": f"echo: {user}"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    """返回模拟服务；每个测试使用新的 AI 线程池与连接池"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    server.latency = 0.0
+    server.connections = set()
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ai_service, "DEEPSEEK_API_URL", f"http://127.0.0.1:{server.server_address[1]}/v1/chat")
+    monkeypatch.setattr(ai_service, "_pool", None)
+    monkeypatch.setattr(config, "REQUEST_LOG", False)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _chat(client, message):
+    return client.post("/app/ai/chat", json={"message": message, "context": {}})
+
+
+def test_chat_reuses_pooled_connection(stub_llm):
+    client = api.app.test_client()
+    for i in range(5):
+        resp = _chat(client, f"hello {i}")
+        assert resp.status_code == 200
+        assert resp.get_json()["content"] == f"echo: hello {i}"
+    assert len(stub_llm.connections) == 1
+
+
+def test_saturated_chat_is_rejected_without_blocking_other_routes(stub_llm, monkeypatch):
+    monkeypatch.setattr(config, "AI_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(config, "AI_MAX_QUEUE", 1)
+    stub_llm.latency = 0.5
+    statuses = []
+    barrier = threading.Barrier(6)
+
+    def send():
+        barrier.wait()
+        resp = _chat(api.app.test_client(), "slow")
+        statuses.append((resp.status_code, resp.headers.get("Retry-After")))
+
+    threads = [threading.Thread(target=send) for _ in range(6)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    t0 = time.perf_counter()
+    assert api.app.test_client().get("/app/auth/check").status_code == 200
+    assert time.perf_counter() - t0 < 0.2
+    for t in threads:
+        t.join()
+
+    assert sorted(s for s, _ in statuses) == [200] * 3 + [429] * 3
+    assert all(retry == str(config.AI_RETRY_AFTER_SECONDS) for s, retry in statuses if s == 429)
+    assert len(stub_llm.connections) <= 2
+    # 名额在调用结束后归还
+    assert _chat(api.app.test_client(), "again").status_code == 200
+
+
+def test_slow_upstream_returns_503(stub_llm, monkeypatch):
+    monkeypatch.setattr(config, "AI_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(config, "AI_MAX_QUEUE", 1)
+    monkeypatch.setattr(config, "AI_REQUEST_TIMEOUT_SECONDS", 0.2)
+    stub_llm.latency = 1.0
+    resp = _chat(api.app.test_client(), "slow")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == str(config.AI_RETRY_AFTER_SECONDS)
+    assert "content" in resp.get_json()
+
+    # 唯一的工作线程仍被上一个调用占用，排队的请求超时后被取消，不会再发往上游
+    assert _chat(api.app.test_client(), "queued").status_code == 503
+    time.sleep(stub_llm.latency)
+    assert stub_llm.messages == ["slow"]
+    # 取消的请求归还名额
+    stub_llm.latency = 0.0
+    assert _chat(api.app.test_client(), "again").status_code == 200
+    assert stub_llm.messages == ["slow", "again"]
@@ -0,0 +1,98 @@
+"""
+测试结果缓存 (LRU 淘汰、内存上限、并发请求合并)
+运行: python -m pytest -q test_cache.py
+"""
+import threading
+import time
+
+import pytest
+
+from cache import ResultCache, estimate_size
+
+
+def test_lru_eviction_by_entries():
+    cache = ResultCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.get_or_compute(key, lambda: key.upper())
+    cache.get_or_compute("a", lambda: "unused")      # a 变为最近使用
+    cache.get_or_compute("c", lambda: "C")           # 淘汰 b
+
+    assert cache.get_or_compute("a", lambda: "miss") == "A"
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_memory_bound():
+    big = list(range(10_000))
+    cache = ResultCache(max_entries=100, max_bytes=estimate_size(big) * 2)
+    for i in range(5):
+        cache.get_or_compute(i, lambda: list(big))
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+
+
+def test_concurrent_identical_requests_compute_once():
+    cache = ResultCache()
+    calls = []
+    gate = threading.Event()
+
+    def slow():
+        calls.append(1)
+        gate.wait(5)
+        return {"value": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 8
+    assert cache.stats()["coalesced"] == 7
+
+
+def test_error_is_shared_and_not_cached():
+    cache = ResultCache()
+
+    def boom():
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", boom)
+    assert cache.get_or_compute("k", lambda: "ok") == "ok"
+
+
+def test_clear_during_compute_discards_result():
+    cache = ResultCache()
+
+    def compute():
+        cache.clear()
+        return "stale"
+
+    assert cache.get_or_compute("k", compute) == "stale"
+    assert cache.stats()["entries"] == 0
+
+
+def test_service_cache_invalidated_on_reload():
+    import service
+    from conftest import make_signals, START_TS
+
+    loader = service.data_loader
+    saved = (loader.df_data, loader.df_signals)
+    try:
+        loader.load_frames(saved[0], make_signals(n=50))
+        first, _ = service.run_backtest(START_TS, START_TS + 86400, 0, 10000)
+        again, _ = service.run_backtest(START_TS, START_TS + 86400, 0, 10000)
+        assert again is first
+
+        loader.load_frames(saved[0], make_signals(n=10))
+        reloaded, _ = service.run_backtest(START_TS, START_TS + 86400, 0, 10000)
+        assert len(reloaded) == 10
+    finally:
+        loader.load_frames(*saved)
@@ -0,0 +1,64 @@
+"""
+负载测试工具 (load_test.py) 的测试：并发请求期间反复替换数据快照，统计、SLO 检查与快照一致性
+运行: python -m pytest -q test_load_test.py
+"""
+import contextlib
+import io
+import threading
+
+import api
+import auth
+import config
+import load_test
+import service
+from conftest import START_TS, make_signals, make_trading_data
+
+
+def test_load_test_under_concurrent_reloads(loaded, tmp_path, monkeypatch):
+    """并发请求期间反复替换快照：无 5xx，且每个回测响应的统计与逐笔信号来自同一快照"""
+    monkeypatch.setattr(config, "REQUEST_LOG", False)
+    monkeypatch.setattr(config, "TRACING", False)
+    monkeypatch.setattr(auth, "DB_PATH", str(tmp_path / "users.db"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        auth.init_db()
+        auth.init_default_user()
+    datasets = [(make_trading_data(), make_signals(200)), (make_trading_data(), make_signals(60, seed=3))]
+    loaded(*datasets[0])
+    start, end = START_TS, START_TS + 600 * 60
+
+    stop = threading.Event()
+    mismatched = []
+
+    def swap():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            with contextlib.redirect_stdout(io.StringIO()):
+                service.data_loader.load_frames(*datasets[i % 2])
+
+    def check_backtests():
+        client = api.app.test_client()
+        i = 0
+        while not stop.is_set():
+            i += 1
+            body = client.get(f"/app/getresult?type=backtest&start={start}&end={end}"
+                              f"&zThreshold=0.5&tradeSize={1000 + i}").get_json()
+            if body["totalTrades"] != len(body["signals"]):
+                mismatched.append(body["totalTrades"])
+
+    threads = [threading.Thread(target=swap), threading.Thread(target=check_backtests)]
+    for t in threads:
+        t.start()
+    try:
+        records, elapsed = load_test.run(load_test.in_process_clients(), 6, 1.5, start, end)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    summary = load_test.summarize(records, elapsed)
+    assert set(summary) == {name for name, _, _ in load_test.WORKLOAD} | {"all"}
+    assert summary["all"]["errors"] == 0 and summary["all"]["count"] > 20
+    assert not mismatched
+    assert load_test.check_slo(summary, {"p99": 60_000}, 0.0) == []
+    assert load_test.check_slo(summary, {"p50": 0.0}, 0.0)[0].startswith("getdata.price p50")
@@ -0,0 +1,58 @@
+"""
+请求监控测试：/metrics 的 Prometheus 文本、直方图分桶与成批写出的 JSON 访问日志 (流式响应按实际发送字节)
+运行: python -m pytest -q test_metrics.py
+"""
+import io
+import json
+
+import api
+import metrics
+from conftest import START_TS, make_signals, make_trading_data
+
+
+def test_metrics_endpoint_and_request_log(loaded):
+    loaded(df_data=make_trading_data(n=3000), df_signals=make_signals(n=500))
+    client = api.app.test_client()
+    labels = ("/app/getdata", "GET", "price")
+    before = api.REQUESTS.value(labels + ("200",)), api.LATENCY.count(labels)
+
+    stream = io.StringIO()
+    handler = next(h for h in api.log.handlers if isinstance(h, metrics.BufferedHandler))
+    handler.flush()                     # 之前测试的日志先写出
+    saved, handler.target.stream = handler.target.stream, stream
+    try:
+        for _ in range(3):
+            client.get(f"/app/getdata?type=price&start={START_TS}&end={START_TS + 3000 * 60}")
+        client.get(f"/app/getdata?type=bogus&start={START_TS}")
+        streamed = client.get(f"/app/getresult?type=signals&format=ndjson&start={START_TS}&zThreshold=0")
+        assert streamed.data.count(b"\n") == 500
+        handler.flush()
+    finally:
+        handler.target.stream = saved
+
+    assert api.REQUESTS.value(labels + ("200",)) == before[0] + 3
+    assert api.LATENCY.count(labels) == before[1] + 3
+    assert api.REQUESTS.value(("/app/getdata", "GET", "other", "400")) >= 1
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [e["route"] for e in entries].count("/app/getdata") == 4
+    ndjson = next(e for e in entries if e["query"].startswith("type=signals&format=ndjson"))
+    assert ndjson["status"] == 200 and ndjson["bytes"] == len(streamed.data)    # 流式响应按实际发送字节
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'api_request_duration_seconds_bucket{route="/app/getdata",method="GET",type="price",le="+Inf"}' in text
+    assert 'api_data_rows{table="data"} 3000' in text and 'api_data_rows{table="signals"} 500' in text
+    assert 'api_result_cache_lookups_total{result="hits"}' in text
+    assert "api_data_memory_bytes" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram("test_seconds", "test", ("route",), (0.1, 1))
+    metrics._metrics.remove(h)
+    for value in (0.05, 0.1, 0.5, 2):
+        h.observe(("/x",), value)
+    lines = h.render()
+    assert 'test_seconds_bucket{route="/x",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 'test_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{route="/x"} 4' in lines
@@ -0,0 +1,61 @@
+"""
+按需采样分析测试：管理员请求头 / 管理员接口触发分析，写出火焰图格式的 .folded 文件，文件名只使用白名单标签
+运行: python -m pytest -q test_profiler.py
+"""
+import api
+import config
+from conftest import START_TS, make_signals
+from profiler import profiler
+
+
+def test_profiler_writes_folded_stacks(loaded, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "PROFILE_INTERVAL_SECONDS", 0.0005)
+    loaded(df_signals=make_signals(n=20000))
+    client = api.app.test_client()
+    sweep = f"/app/getresult?type=sweep&start={START_TS}&end={START_TS + 600 * 60}"
+
+    # 非管理员的请求头不生效
+    assert "X-Profile-File" not in client.get(sweep, headers={"X-Profile": "1"}).headers
+    assert client.post("/app/admin/profile", json={"next": 1}).status_code == 403
+
+    with client.session_transaction() as sess:
+        sess["logged_in"], sess["username"] = True, "admin"
+    path = client.get(sweep + "&tradeSizes=500", headers={"X-Profile": "1"}).headers["X-Profile-File"]
+    assert path.startswith(str(tmp_path / "getresult" / "sweep-"))
+    lines = open(path).read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("api.py:getresult" in line and "service.py:run_sweep" in line for line in lines)
+
+    # 管理员接口：分析接下来的 1 个请求 (流式响应在发送完后写出)
+    assert client.post("/app/admin/profile", json={"next": 1}).get_json()["pending"] == 1
+    resp = client.get(f"/app/getresult?type=signals&format=ndjson&start={START_TS}&zThreshold=0")
+    assert resp.data and "X-Profile-File" not in resp.headers
+    status = client.get("/app/admin/profile").get_json()
+    assert status["pending"] == 0 and status["recent"][-1]["path"].startswith(str(tmp_path / "getresult" / "signals-"))
+    assert client.post("/app/admin/profile", json={"sampleEvery": "x"}).status_code == 400
+    assert profiler.sample_every == 0
+
+
+def test_profiler_ignores_untrusted_labels(loaded, tmp_path, monkeypatch):
+    """type 参数不进入文件名；登录等非数据接口不占用预设的分析名额"""
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path / "profiles"))
+    loaded()
+    client = api.app.test_client()
+    with client.session_transaction() as sess:
+        sess["logged_in"], sess["username"] = True, "admin"
+    assert client.post("/app/admin/profile", json={"next": 1}).status_code == 200
+
+    assert "X-Profile-File" not in client.get("/app/auth/check?type=../x").headers
+    assert profiler.pending == 1
+    resp = client.get(f"/app/getdata?type=../x&start={START_TS}")
+    assert resp.status_code in (200, 400, 500)
+    assert profiler.pending == 0
+    written = [str(p) for p in tmp_path.rglob("*.folded")]
+    assert len(written) == 1 and written[0].startswith(str(tmp_path / "profiles" / "getdata" / "other-"))
+    assert not (tmp_path / "x").exists()
+
+    # 请求头触发时也只使用白名单标签
+    path = client.get(f"/app/getresult?type=../../y&start={START_TS}", headers={"X-Profile": "1"}).headers.get(
+        "X-Profile-File")
+    assert path is None or path.startswith(str(tmp_path / "profiles" / "getresult" / "other-"))
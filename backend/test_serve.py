@@ -0,0 +1,113 @@
+"""
+多进程部署测试：serve.py 启动多个工作进程，共享端口与 mmap 数据存储
+运行: python -m pytest -q test_serve.py   (需要 os.fork，仅 POSIX)
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import data_store
+from conftest import make_signals, make_trading_data
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="serve.py requires os.fork")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=10) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def _children(pid):
+    """/proc 中父进程为 pid 的进程"""
+    found = set()
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                        found.add(int(entry))
+            except OSError:
+                pass
+    return found
+
+
+@pytest.fixture
+def server(tmp_path):
+    data_csv, sig_csv, store = tmp_path / "data.csv", tmp_path / "signals.csv", tmp_path / "store"
+    make_trading_data().to_csv(data_csv, index=False)
+    make_signals().to_csv(sig_csv, index=False)
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+         "--data", str(data_csv), "--signals", str(sig_csv), "--store", str(store)],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            if _get(base + "/app/health")[0] == 200:
+                break
+        except OSError:
+            pass
+        if proc.poll() is not None or time.monotonic() > deadline:
+            proc.kill()
+            raise RuntimeError("serve.py never became ready")
+        time.sleep(0.1)
+    yield proc, base, store, [str(data_csv), str(sig_csv)]
+    proc.send_signal(signal.SIGTERM)
+    proc.wait(timeout=30)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_workers_share_port_and_store(server):
+    proc, base, store, sources = server
+    # 主进程先生成存储，工作进程以 mmap 方式打开
+    assert data_store.is_fresh(str(store), sources)
+    workers = _children(proc.pid)
+    assert len(workers) == 2
+
+    pids = set()
+    for _ in range(40):
+        status, body = _get(base + "/app/health")
+        assert status == 200
+        pids.add(body["pid"])
+    assert pids <= workers
+
+    status, body = _get(base + "/app/getdata?type=price&interval=1m")
+    assert status == 200 and body["cex"]
+
+    # 工作进程退出后由主进程重新启动
+    os.kill(next(iter(workers)), signal.SIGKILL)
+    deadline = time.monotonic() + 30
+    while len(_children(proc.pid) - workers) < 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.1)
+    assert len(_children(proc.pid)) == 2
+
+
+def test_terminate_stops_workers(server):
+    proc, _, _, _ = server
+    workers = _children(proc.pid) if os.path.isdir("/proc") else set()
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=30) == 0
+    for pid in workers:
+        assert not os.path.exists(f"/proc/{pid}") or open(f"/proc/{pid}/stat").read().split()[2] == "Z"
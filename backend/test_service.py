@@ -0,0 +1,619 @@
+"""
+测试 service 层的数据查询与计算 (使用内存构造的数据，无需启动服务器)
+运行: python -m pytest -q test_service.py
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import service
+from conftest import START_TS, make_signals, make_trading_data
+
+def test_time_slice_matches_mask(loaded):
+    df = make_trading_data(shuffle=True)
+    loader = loaded(df_data=df, df_signals=make_signals(shuffle=True))
+
+    assert (np.diff(loader.data_ts) >= 0).all()
+    assert (np.diff(loader.signals_ts) >= 0).all()
+
+    for start, end in [(START_TS, START_TS + 3600), (START_TS + 61, START_TS + 119),
+                       (0, 2 ** 40), (START_TS - 100, START_TS - 1)]:
+        got = loader.slice_data(start, end)
+        expected = df[(df["timestamp"] >= start) & (df["timestamp"] <= end)]
+        assert got["timestamp"].tolist() == sorted(expected["timestamp"].tolist())
+
+
+def test_time_slice_inclusive_bounds(loaded):
+    loader = loaded()
+    got = loader.slice_data(START_TS + 60, START_TS + 180)
+    assert got["timestamp"].tolist() == [START_TS + 60, START_TS + 120, START_TS + 180]
+
+
+def test_price_series_matches_row_by_row():
+    from bench_price import legacy_price_series
+
+    df = make_trading_data()
+    df.loc[5, "binance_close"] = np.inf
+    df.loc[7, "binance_volume"] = np.nan
+    got = service._build_price_series(df)
+    expected = legacy_price_series(df)
+    for side in ("cex", "dex"):
+        assert [{**p, "lat_ms": 0} for p in got[side]] == expected[side]
+        assert all(10 <= p["lat_ms"] <= 50 for p in got[side])
+
+
+def test_rollup_matches_groupby():
+    import rollup
+
+    df = make_trading_data(n=1000)
+    frame = rollup.build_rollup(df, 300)
+    groups = df.groupby(df["timestamp"] // 300 * 300)
+
+    assert frame["timestamp"].tolist() == list(groups.groups)
+    np.testing.assert_allclose(frame["binance_high"], groups["binance_high"].max())
+    np.testing.assert_allclose(frame["binance_low"], groups["binance_low"].min())
+    np.testing.assert_allclose(frame["binance_close"], groups["binance_close"].last())
+    np.testing.assert_allclose(frame["binance_volume"], groups["binance_volume"].sum())
+
+    valid = df["uniswap_avg_price"] > 0
+    dex_mean = df["uniswap_avg_price"].where(valid).groupby(df["timestamp"] // 300).mean()
+    np.testing.assert_allclose(frame["uniswap_avg_price"], dex_mean.to_numpy())
+    spike = df["price_difference"].where(valid).abs().groupby(df["timestamp"] // 300).max()
+    np.testing.assert_allclose(frame["price_difference"].abs(), spike.to_numpy())
+
+
+def test_rollup_level_choice():
+    import rollup
+
+    month = make_trading_data(n=30 * 24 * 60)
+    pyramid = rollup.build_pyramid(month, ["1m", "5m", "15m", "1h", "4h", "1d"])
+    end = START_TS + 30 * 86400 - 1
+    assert rollup.choose_level(pyramid, START_TS, end, 60, 1000) == 900
+    assert rollup.choose_level(pyramid, START_TS, START_TS + 3600, 60, 1000) == 60
+    assert rollup.choose_level(pyramid, START_TS, START_TS + 3600, 900, 1000) == 900
+    assert rollup.parse_interval("4h") == 14400
+    assert rollup.parse_interval("bogus") == 60
+
+
+def test_spread_at_minute_level_matches_rows(loaded):
+    df = make_trading_data(n=300)
+    loaded(df_data=df)
+    got = service.get_spread_data(START_TS, START_TS + 299 * 60, interval="1m")
+
+    rows = df[df["uniswap_avg_price"].notna() & (df["uniswap_avg_price"] != 0)]
+    assert [p["t"] for p in got] == rows["timestamp"].tolist()
+    z = (rows["price_difference"] / rows["uniswap_price_std"]).abs()
+    assert [p["z"] for p in got] == z.tolist()            # 价格比、标准差与 spread_z 为 float64，与逐行计算完全一致
+    assert [p["spreadPct"] for p in got] == rows["price_ratio"].tolist()
+    np.testing.assert_allclose([p["spread"] for p in got], rows["price_difference"])
+
+
+def test_downsample_keeps_spikes():
+    import downsample
+
+    rng = np.random.default_rng(3)
+    x = np.arange(100_000, dtype=np.int64) * 60
+    y = rng.normal(0, 1, len(x))
+    y[12_345], y[67_890] = 50.0, -40.0      # 单点尖峰
+
+    for method in ("m4", "lttb"):
+        idx = downsample.select(x, y, method, width=None, limit=1000)
+        assert len(idx) <= 1000
+        assert (np.diff(idx) > 0).all()
+        assert 12_345 in idx and 67_890 in idx
+        assert idx[0] == 0 and idx[-1] == len(x) - 1
+
+    idx = downsample.select(x, y, "stride", width=None, limit=1000)
+    assert 12_345 not in idx and len(idx) == 1000
+
+
+def test_downsample_width_never_exceeds_limit():
+    import downsample
+
+    x = np.arange(50_000, dtype=np.int64) * 60
+    y = np.sin(np.arange(len(x)) / 50.0)
+    for method in ("m4", "lttb", "stride"):
+        for limit in (1000, 7, 3):
+            for width in (None, 5000, 10 ** 6):
+                assert len(downsample.select(x, y, method, width=width, limit=limit)) <= limit
+
+
+def test_chart_endpoints_bound_payload(loaded):
+    df = make_trading_data(n=5000)
+    df.loc[2500, "price_difference"] = 999.0
+    df.loc[2500, "uniswap_avg_price"] = df.loc[2500, "binance_close"] + 999.0
+    loaded(df_data=df)
+    end = START_TS + 5000 * 60
+
+    spread = service.get_spread_data(START_TS, end, "1m", "m4", width=100)
+    assert len(spread) <= 400
+    assert max(p["spread"] for p in spread) == 999.0
+
+    price = service.get_price_data(START_TS, end, "1m", "lttb", width=200)
+    assert 0 < len(price["cex"]) <= 200 and 0 < len(price["dex"]) <= 200
+
+    with pytest.raises(ValueError):
+        service.get_price_data(START_TS, end, "1m", "bogus")
+
+
+def test_backtest_matches_row_by_row(loaded):
+    from bench_backtest import legacy_backtest
+
+    df = make_signals(n=500)
+    df.loc[3, "zscore"] = np.nan
+    loader = loaded(df_signals=df)
+    end = START_TS + 600 * 60
+
+    for z_threshold, size in [(0, 10000), (1.5, 5000), (2.0, 250000), (99, 10000)]:
+        signals, stats = service.run_backtest(START_TS, end, z_threshold, size)
+        exp_signals, exp_stats = legacy_backtest(loader.df_signals, START_TS, z_threshold, size)
+
+        assert signals == exp_signals
+        for key in ("totalTrades", "winningTrades", "winRate", "totalProfit", "avgProfit",
+                    "maxDrawdown", "sharpeRatio"):
+            assert stats[key] == pytest.approx(exp_stats[key], abs=0.011), key
+        assert [e["time"] for e in stats["equity"]] == [e["time"] for e in exp_stats["equity"]]
+        np.testing.assert_allclose([e["equity"] for e in stats["equity"]],
+                                   [e["equity"] for e in exp_stats["equity"]], atol=0.011)
+
+
+def test_sweep_matches_individual_backtests(loaded):
+    loaded(df_signals=make_signals(n=400))
+    end = START_TS + 600 * 60
+    z_list, size_list = [0.0, 0.5, 1.7, 3.0, 50.0], [1000, 10000, 75000]
+
+    grid = service.run_sweep(START_TS, end, z_list, size_list)
+    for i, z in enumerate(z_list):
+        for j, size in enumerate(size_list):
+            _, stats = service.run_backtest(START_TS, end, z, size)
+            assert grid["totalTrades"][i] == stats["totalTrades"]
+            assert grid["winRate"][i][j] == pytest.approx(stats["winRate"])
+            assert grid["totalProfit"][i][j] == pytest.approx(stats["totalProfit"], abs=0.011)
+            assert grid["maxDrawdown"][i][j] == pytest.approx(stats["maxDrawdown"])
+            assert grid["sharpeRatio"][i][j] == pytest.approx(stats["sharpeRatio"])
+
+
+
+def test_sweep_rejects_bad_parameters(loaded):
+    import api
+    import config
+
+    loaded()
+    client = api.app.test_client()
+    base = f"/app/getresult?type=sweep&start={START_TS}"
+    too_many = ",".join(["1"] * (config.SWEEP_MAX_GRID + 1))
+    for query in ("zThresholds=a,b", "tradeSizes=1,x", "zThresholds=,", "zThresholds=nan",
+                  f"tradeSizes={too_many}", "zThresholds=1,2&tradeSizes=" + ",".join(["1000"] * 6000),
+                  "tradeSizes=0", "tradeSizes=1000,-5", "tradeSize=-1", "tradeSize=0"):
+        resp = client.get(f"{base}&{query}")
+        assert resp.status_code == 400, query
+        assert "error" in resp.get_json()
+    assert client.get(f"/app/getresult?type=backtest&start={START_TS}&zThreshold=x").status_code == 400
+    assert client.get(f"/app/getresult?type=backtest&start={START_TS}&tradeSize=-1").status_code == 400
+    assert client.get(f"{base}&zThresholds=1,2&tradeSizes=1000").status_code == 200
+
+def test_heatmap_matches_groupby(loaded):
+    df = make_trading_data(n=3 * 24 * 60)
+    sig = make_signals(n=300)
+    loaded(df_data=df, df_signals=sig)
+    start, end = START_TS + 3600, START_TS + 2 * 86400
+
+    def cell_of(frame):
+        local = pd.to_datetime(frame["timestamp"] + 8 * 3600, unit="s")
+        return ((local.dt.dayofweek + 1) % 7) * 24 + local.dt.hour   # 0=周日
+
+    rows = df[(df["timestamp"] >= start) & (df["timestamp"] <= end) & (df["uniswap_avg_price"] > 0)]
+    expected = rows["price_difference"].abs().groupby(cell_of(rows)).mean().round(2)
+    got = {d * 24 + h: v for d, h, v in service.get_heatmap_data(start, end)}
+    assert len(got) == 7 * 24
+    for cell, value in got.items():
+        assert value == pytest.approx(expected.get(cell, 0.0))
+
+    sigs = sig[(sig["timestamp"] >= start) & (sig["timestamp"] <= end)]
+    counts = {d * 24 + h: v for d, h, v in service.get_heatmap_data(start, end, "count")}
+    assert counts == {c: int(sigs.groupby(cell_of(sigs)).size().get(c, 0)) for c in range(168)}
+    profit = {d * 24 + h: v for d, h, v in service.get_heatmap_data(start, end, "profit")}
+    assert sum(profit.values()) == pytest.approx(sigs["net_profit"].sum(), abs=1)
+
+
+def test_correlation_detects_lead_lag(loaded):
+    n, lag = 5000, 3
+    rng = np.random.default_rng(7)
+    cex_r = rng.normal(0, 1e-3, n + lag)
+    cex = 4400 * np.exp(np.cumsum(cex_r))
+    dex = np.empty(n + lag)
+    dex[lag:] = cex[:-lag]                       # DEX 滞后 CEX 3 分钟
+    dex[:lag] = cex[0]
+    df = make_trading_data(n=n + lag)
+    df["binance_close"] = cex
+    df["uniswap_avg_price"] = dex
+    loaded(df_data=df)
+
+    result = service.get_correlation_data(START_TS, START_TS + (n + lag) * 60, 20)
+    assert result["peakLag"] == lag
+    assert result["leader"] == "CEX"
+    assert result["peakCorrelation"] > 0.95
+    assert [p["lag"] for p in result["lags"]] == list(range(-20, 21))
+
+    r_c, r_d = np.diff(np.log(cex)), np.diff(np.log(dex))
+    by_lag = {p["lag"]: p["correlation"] for p in result["lags"]}
+    for k in (-5, 0, 1, 7):
+        a, b = (r_c[:len(r_c) - k], r_d[k:]) if k >= 0 else (r_c[-k:], r_d[:k])
+        assert by_lag[k] == pytest.approx(np.corrcoef(a, b)[0, 1], abs=0.02)
+
+
+def test_correlation_empty_range(loaded):
+    loaded()
+    result = service.get_correlation_data(0, 10)
+    assert result["lags"] == [] and result["peakLag"] is None
+
+
+def _is_memory_mapped(arr):
+    import mmap
+    while arr is not None:
+        if isinstance(arr, (np.memmap, mmap.mmap)):
+            return True
+        arr = getattr(arr, "base", None)
+    return False
+
+
+def test_columnar_store_roundtrip(loaded, tmp_path):
+    import data_store
+
+    df, sig = make_trading_data(n=2000, shuffle=True), make_signals(n=300, shuffle=True)
+    parts = service.build_parts(df, sig)
+    data_store.write_store(parts, str(tmp_path / "store"), [])
+    stored = data_store.read_store(str(tmp_path / "store"))
+
+    assert _is_memory_mapped(stored["df_data"]["binance_close"].to_numpy())
+    for table in ("df_data", "df_signals"):
+        for col in parts[table].columns:
+            stored_col, built_col = np.asarray(stored[table][col]), np.asarray(parts[table][col])
+            assert stored_col.dtype == built_col.dtype, col
+            assert np.array_equal(stored_col, built_col, equal_nan=stored_col.dtype.kind == "f"), col
+    assert sorted(stored["rollups"]) == sorted(parts["rollups"])
+
+    loader = loaded(df_data=df, df_signals=sig)
+    end = START_TS + 2000 * 60
+    expected = (service.get_spread_data(START_TS, end, "5m"),
+                service.run_backtest(START_TS, end, 1.0, 10000)[1],
+                service.get_heatmap_data(START_TS, end))
+    loader.load_store(str(tmp_path / "store"))
+    assert (service.get_spread_data(START_TS, end, "5m"),
+            service.run_backtest(START_TS, end, 1.0, 10000)[1],
+            service.get_heatmap_data(START_TS, end)) == expected
+
+
+def test_columnar_store_freshness(tmp_path):
+    import data_store
+
+    csv = tmp_path / "signals.csv"
+    make_signals(n=10).to_csv(csv, index=False)
+    store = str(tmp_path / "store")
+    assert not data_store.is_fresh(store, [str(csv)])
+
+    data_store.write_store(service.build_parts(pd.DataFrame(), pd.read_csv(csv)), store, [str(csv)])
+    assert data_store.is_fresh(store, [str(csv)])
+
+    make_signals(n=20).to_csv(csv, index=False)
+    assert not data_store.is_fresh(store, [str(csv)])
+
+
+def test_columnar_store_stale_on_settings_or_missing_source(tmp_path, monkeypatch):
+    import config
+    import data_store
+
+    data_csv, sig_csv = tmp_path / "data.csv", tmp_path / "signals.csv"
+    make_trading_data(n=300).to_csv(data_csv, index=False)
+    make_signals(n=30).to_csv(sig_csv, index=False)
+    store, sources = str(tmp_path / "store"), [str(data_csv), str(sig_csv)]
+    parts = data_store.convert(str(data_csv), str(sig_csv), store)
+    assert data_store.is_fresh(store, sources)
+
+    # 转换与直接读取 CSV 得到相同的列与类型
+    direct = service.build_parts(_read_csv(data_csv, "DATA_SCHEMA"), _read_csv(sig_csv, "SIGNALS_SCHEMA"))
+    for table in ("df_data", "df_signals"):
+        assert dict(parts[table].dtypes) == dict(direct[table].dtypes)
+
+    monkeypatch.setattr(config, "ROLLUP_LEVELS", ["1m", "1h"])
+    assert not data_store.is_fresh(store, sources)
+    monkeypatch.undo()
+    monkeypatch.setattr(config, "TIMEZONE_OFFSET_HOURS", 0)
+    assert not data_store.is_fresh(store, sources)
+    monkeypatch.undo()
+    assert data_store.is_fresh(store, sources)
+
+    os.remove(sig_csv)
+    assert not data_store.is_fresh(store, sources)
+    assert data_store.is_compatible(store)
+
+
+def _read_csv(path, name):
+    import schema
+    return schema.read_csv(path, getattr(schema, name))
+
+
+def test_reload_swaps_snapshot_atomically(loaded, tmp_path, monkeypatch):
+    import config
+
+    loader = loaded()
+    data_csv, sig_csv = tmp_path / "data.csv", tmp_path / "signals.csv"
+    make_trading_data(n=100).to_csv(data_csv, index=False)
+    make_signals(n=7).to_csv(sig_csv, index=False)
+    monkeypatch.setattr(config, "DATA_CSV_PATH", str(data_csv))
+    monkeypatch.setattr(config, "SIGNALS_CSV_PATH", str(sig_csv))
+    monkeypatch.setattr(config, "DATA_STORE_DIR", str(tmp_path / "no_store"))
+
+    in_flight = loader.snapshot()
+    version = loader.version
+    assert loader.reload_async()
+    loader.wait_reload(10)
+
+    assert loader.version == version + 1
+    assert loader.status()["source"] == "csv" and loader.status()["signalRows"] == 7
+    assert len(in_flight.df_signals) == 200          # 进行中的请求仍看到旧快照
+    assert len(service.run_backtest(0, 2 ** 40, 0, 10000)[0]) == 7
+
+
+def test_failed_reload_keeps_previous_snapshot(loaded, monkeypatch):
+    loader = loaded()
+    before = loader.snapshot()
+    monkeypatch.setattr(service, "_read_parts", lambda: 1 / 0)
+    assert not loader.reload()
+    assert loader.snapshot() is before
+    assert "division" in loader.status()["lastError"]
+    loader.last_error = None
+
+
+def test_admin_reload_endpoint(loaded):
+    import api
+
+    loaded()
+    client = api.app.test_client()
+    assert client.post("/app/admin/reload").status_code == 403
+
+    with client.session_transaction() as sess:
+        sess["logged_in"], sess["username"] = True, "admin"
+    resp = client.get("/app/admin/data")
+    assert resp.status_code == 200 and resp.get_json()["version"] == service.data_loader.version
+
+
+def test_compact_schema_types_and_memory(loaded, tmp_path):
+    import schema
+
+    df, sig = make_trading_data(n=2000), make_signals(n=300)
+    sig_csv = tmp_path / "signals.csv"
+    sig.assign(gas_cost=1.0).to_csv(sig_csv, index=False)
+    parts = service.build_parts(df, schema.read_csv(str(sig_csv), schema.SIGNALS_SCHEMA))
+
+    data, signals = parts["df_data"], parts["df_signals"]
+    assert "time_bucket" not in data.columns and "gas_cost" not in signals.columns
+    assert data["timestamp"].dtype == np.int32 and parts["data_ts"].dtype == np.int32
+    assert data["binance_volume"].dtype == np.float32 and data["binance_close"].dtype == np.float64
+    assert isinstance(signals["direction"].dtype, pd.CategoricalDtype)
+    assert parts["rollups"][300][0]["binance_volume"].dtype == np.float32
+
+    report = schema.memory_report(parts)
+    assert data["price_ratio"].dtype == data["uniswap_price_std"].dtype == np.float64
+    assert report["data"] == len(data) * (8 * 8 + 2 * 4 + 2 * 4)      # float64 ×8, float32 ×2, int32 ×2
+    assert report["total"] == sum(v for k, v in report.items() if k != "total")
+
+    # float32 列按最短十进制表示输出
+    loaded(df_data=df.assign(binance_volume=0.1))
+    points = service.get_price_data(START_TS, START_TS + 600, "1m")["cex"]
+    assert {p["v"] for p in points} == {0.1}
+    assert service.data_loader.status()["memory"]["total"] > 0
+
+
+def test_columnar_format_matches_rows(loaded):
+    import api
+
+    loaded(df_data=make_trading_data(n=3000))
+    end = START_TS + 3000 * 60
+    rows = service.get_price_data(START_TS, end, "1m", "lttb")
+    cols = service.get_price_data(START_TS, end, "1m", "lttb", None, "columnar")
+    for side in ("cex", "dex"):
+        assert cols[side]["t"] == [p["t"] for p in rows[side]]
+        assert cols[side]["v"] == [p["v"] for p in rows[side]]
+
+    spread = service.get_spread_data(START_TS, end, "5m", fmt="columnar")
+    assert [dict(zip(spread, v)) for v in zip(*spread.values())] == service.get_spread_data(START_TS, end, "5m")
+    heat = service.get_heatmap_data(START_TS, end, "count", "columnar")
+    assert [list(c) for c in zip(*heat.values())] == service.get_heatmap_data(START_TS, end, "count")
+    corr = service.get_correlation_data(START_TS, end, 5, "columnar")
+    assert corr["lags"]["lag"] == [x["lag"] for x in service.get_correlation_data(START_TS, end, 5)["lags"]]
+
+    client = api.app.test_client()
+    url = f"/app/getdata?type=price&interval=1m&start={START_TS}&end={end}"
+    assert len(client.get(url + "&format=columnar").data) < len(client.get(url).data) * 0.75
+    assert client.get(url + "&format=xml").status_code == 400
+
+
+def test_arrow_stream_matches_json(loaded):
+    pa = pytest.importorskip("pyarrow")
+    import api
+    import config
+
+    loader = loaded(df_data=make_trading_data(n=3000), df_signals=make_signals(n=500))
+    client = api.app.test_client()
+    arrow = {"Accept": "application/vnd.apache.arrow.stream"}
+    end = START_TS + 3000 * 60
+
+    def read(url):
+        resp = client.get(url, headers=arrow)
+        assert resp.status_code == 200 and resp.mimetype == "application/vnd.apache.arrow.stream"
+        return pa.ipc.open_stream(resp.data).read_all()
+
+    config_rows, config.ARROW_BATCH_ROWS = config.ARROW_BATCH_ROWS, 1000
+    try:
+        table = read(f"/app/getdata?type=price&interval=1m&start={START_TS}&end={end}")
+    finally:
+        config.ARROW_BATCH_ROWS = config_rows
+    assert table.num_rows == 3000 and len(table.to_batches()) == 3   # 不降采样，按 batch 流式写出
+    assert table["t"].to_pylist() == loader.data_ts.tolist()
+
+    signals = read(f"/app/getresult?type=signals&start={START_TS}&end={end}&zThreshold=1.5&tradeSize=5000")
+    expected, stats = service.run_backtest(START_TS, end, 1.5, 5000.0)
+    assert [str(x) for x in signals["id"].to_pylist()] == [s["id"] for s in expected]
+    assert signals["direction"].to_pylist() == [s["direction"] for s in expected]
+    assert signals["netProfit"].to_pylist() == [s["netProfit"] for s in expected]
+
+    curve = read(f"/app/getresult?type=backtest&start={START_TS}&end={end}&zThreshold=1.5&tradeSize=5000")
+    assert curve["equity"].to_pylist() == [e["equity"] for e in stats["equity"]]
+    assert float(curve.schema.metadata[b"totalProfit"]) == stats["totalProfit"]
+
+    sweep = read(f"/app/getresult?type=sweep&start={START_TS}&end={end}&zThresholds=1,2&tradeSizes=1000,5000,9000")
+    assert sweep.num_rows == 6 and sweep["tradeSize"].to_pylist()[:3] == [1000, 5000, 9000]
+
+    lags = read(f"/app/getdata?type=correlation&start={START_TS}&end={end}&maxLag=3")
+    assert lags["lag"].to_pylist() == [-3, -2, -1, 0, 1, 2, 3]
+    assert client.get(f"/app/getdata?type=price&start={START_TS}&end={end}").mimetype == "application/json"
+
+
+def test_conditional_get_and_compression(loaded):
+    import gzip
+    import json
+
+    import api
+
+    loaded(df_data=make_trading_data(n=3000))
+    client = api.app.test_client()
+    url = f"/app/getdata?type=price&interval=1m&start={START_TS}&end={START_TS + 3000 * 60}"
+
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.headers["Cache-Control"].startswith("public, max-age=")
+    assert "Content-Encoding" not in first.headers
+
+    calls = []
+    original = service.get_price_data
+    service.get_price_data = lambda *a: calls.append(a) or original(*a)
+    try:
+        again = client.get(url, headers={"If-None-Match": etag})
+    finally:
+        service.get_price_data = original
+    assert again.status_code == 304 and again.data == b"" and calls == []    # 命中时不执行查询
+    assert again.headers["ETag"] == etag
+
+    zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip" and zipped.headers["ETag"] != etag
+    assert json.loads(gzip.decompress(zipped.data))["cex"][0]["t"] == first.get_json()["cex"][0]["t"]
+    assert client.get(url, headers={"If-None-Match": zipped.headers["ETag"]}).status_code == 304
+
+    future = client.get(f"/app/getdata?type=heatmap&start={START_TS}&end=4102444800")
+    assert future.headers["Cache-Control"] == "no-cache"
+    error = client.get(f"/app/getdata?type=heatmap&metric=bogus&start={START_TS}")
+    assert error.status_code == 400 and "ETag" not in error.headers
+
+    loaded(df_data=make_trading_data(n=3000, seed=5))           # 数据变化后 ETag 失效
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_streamed_arrow_is_compressed(loaded):
+    pa = pytest.importorskip("pyarrow")
+    brotli = pytest.importorskip("brotli")
+    import api
+
+    loaded(df_data=make_trading_data(n=3000))
+    resp = api.app.test_client().get(
+        f"/app/getdata?type=spread&interval=1m&start={START_TS}&end={START_TS + 3000 * 60}",
+        headers={"Accept": "application/vnd.apache.arrow.stream", "Accept-Encoding": "gzip, br"})
+    assert resp.headers["Content-Encoding"] == "br" and resp.headers["ETag"].endswith('-br"')
+    assert pa.ipc.open_stream(brotli.decompress(resp.data)).read_all().num_rows == 3000
+
+
+def test_signal_stream_and_keyset_pages(loaded):
+    import gzip
+    import json
+
+    import api
+
+    sig = make_signals(n=5000, shuffle=True)
+    sig.loc[:40, "timestamp"] = START_TS + 600      # 同一时间戳的多条信号按 id 排序
+    loaded(df_signals=sig)
+    end = START_TS + 600 * 60
+    expected, _ = service.run_backtest(START_TS, end, 0.5, 5000.0)
+
+    import config
+    chunk, config.SIGNAL_STREAM_CHUNK_ROWS = config.SIGNAL_STREAM_CHUNK_ROWS, 300
+    try:
+        client = api.app.test_client()
+        base = f"/app/getresult?type=signals&start={START_TS}&end={end}&zThreshold=0.5&tradeSize=5000"
+        resp = client.get(base + "&format=ndjson", headers={"Accept-Encoding": "gzip"})
+        assert resp.is_streamed and resp.mimetype == "application/x-ndjson"
+        lines = gzip.decompress(resp.data).decode().splitlines()
+        assert [json.loads(line) for line in lines] == expected
+
+        pages, after = [], None
+        while True:
+            page = client.get(base + "&limit=700" + (f"&after={after}" if after else "")).get_json()
+            pages.extend(page["signals"])
+            after = page["next"]
+            if after is None:
+                break
+        assert pages == expected
+    finally:
+        config.SIGNAL_STREAM_CHUNK_ROWS = chunk
+
+    assert client.get(base + "&after=abc").status_code == 400
+    assert client.get(base + "&limit=0").status_code == 400
+
+
+def test_lean_backtest_response(loaded):
+    import json
+
+    import api
+
+    loaded(df_signals=make_signals(n=20000))
+    client = api.app.test_client()
+    end = START_TS + 600 * 60
+    base = f"/app/getresult?type=backtest&start={START_TS}&end={end}&zThreshold=0&tradeSize=5000"
+    signals, stats = service.run_backtest(START_TS, end, 0.0, 5000.0)
+    assert "signals" not in stats
+
+    full = client.get(base).get_json()                  # 默认响应与之前兼容
+    assert full["signals"] == signals and full["equity"] == stats["equity"]
+
+    lean = client.get(base + "&fields=stats,equity&equityPoints=200")
+    body = lean.get_json()
+    assert "signals" not in body and body["totalProfit"] == stats["totalProfit"]
+    assert len(body["equity"]) <= 200 and len(lean.data) < 16 * 1024
+    curve = [e["equity"] for e in stats["equity"]]
+    kept = [e["equity"] for e in body["equity"]]
+    assert max(kept) == max(curve) and min(kept) == min(curve)          # 极值保留
+    assert body["equity"][0] == stats["equity"][0] and body["equity"][-1] == stats["equity"][-1]
+
+    no_signals = client.get(base + "&includeSignals=false").get_json()
+    assert set(no_signals) == set(full) - {"signals"}
+    assert set(json.loads(client.get(base + "&fields=stats").data)) == {
+        "totalTrades", "winningTrades", "winRate", "totalProfit", "avgProfit", "maxDrawdown", "sharpeRatio"}
+    assert client.get(base + "&fields=trades").status_code == 400
+    assert client.get(base + "&fields=signals&includeSignals=false").status_code == 400
+    assert client.get(base + "&equityPoints=2").status_code == 400
+
+
+def test_synthetic_data_loads_and_bench_compare(loaded):
+    import bench_service
+    import synthetic_data
+
+    df_data, df_signals = synthetic_data.dataset("1m")
+    assert len(df_data) == 30 * 1440 and np.all(np.diff(df_data["timestamp"]) == 60)
+    assert set(make_trading_data().columns) - {"time_bucket"} <= set(df_data.columns)
+    assert set(make_signals().columns) <= set(df_signals.columns)
+    assert 1500 < len(df_signals) < 2100 and df_signals["timestamp"].is_monotonic_increasing
+    # 信号价格与对应分钟的行情一致
+    row = df_data.set_index("timestamp").loc[df_signals["timestamp"].iloc[0]]
+    assert df_signals["binance_close_price"].iloc[0] == row["binance_close"]
+
+    loaded(df_data, df_signals)
+    start, end = synthetic_data.START_TS, synthetic_data.START_TS + 30 * 86400
+    signals, stats = service.run_backtest(start, end, 2.0, 10000)
+    assert stats["totalTrades"] == len(signals) > 0
+
+    baseline = {"spans": {"1m": {"cases": {"a": {"min_ms": 10.0}, "b": {"min_ms": 0.2}, "c": {"min_ms": 5.0}}}}}
+    current = {"spans": {"1m": {"cases": {"a": {"min_ms": 14.0}, "b": {"min_ms": 0.6}, "c": {"min_ms": 5.5},
+                                          "new": {"min_ms": 1.0}}}}}
+    rows = bench_service.compare(current, baseline, tolerance=0.25, min_delta_ms=1.0)
+    assert [(name, slower) for _, name, _, _, _, slower in rows] == [("a", True), ("b", False), ("c", False)]
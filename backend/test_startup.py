@@ -0,0 +1,77 @@
+"""
+启动性能测试：API 模块必须能快速导入，数据与重量级依赖在后台或第一次使用时加载
+冷启动变慢 (例如有人在模块顶层重新导入了 pandas) 时测试失败
+运行: python -m pytest -q test_startup.py
+查看耗时: python test_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# import api 的耗时上限 (秒)；当前约 0.2s，主要是 Flask 本身
+IMPORT_BUDGET_SECONDS = 1.5
+# 这些模块只应在第一次查询数据 / 调用 AI 时加载
+HEAVY_MODULES = ("pandas", "numpy", "requests", "service")
+
+_MEASURE_IMPORT = """
+import json, sys, time
+t0 = time.perf_counter()
+import api
+print(json.dumps({"seconds": time.perf_counter() - t0,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+_MEASURE_READY = """
+import json, time
+import config
+config.REQUEST_LOG = config.TRACING = False     # 只输出下面的测量结果
+t0 = time.perf_counter()
+import api
+client = api.app.test_client()
+first = client.get("/app/health").status_code
+first_data = client.get("/app/getdata?type=heatmap")
+while client.get("/app/health").status_code != 200:
+    if time.perf_counter() - t0 > 60:
+        raise SystemExit("data never became ready")
+    time.sleep(0.05)
+print(json.dumps({"first": first, "firstData": first_data.status_code,
+                  "retryAfter": first_data.headers.get("Retry-After"),
+                  "data": client.get("/app/getdata?type=heatmap").status_code,
+                  "seconds": time.perf_counter() - t0}))
+"""
+
+
+def _run(code):
+    """在全新的解释器中执行，避免测试进程里已经导入的模块影响结果"""
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR,
+                         capture_output=True, text=True, timeout=120, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_import(repeat=3):
+    """多次冷启动取最快一次，减少机器抖动的影响"""
+    runs = [_run(_MEASURE_IMPORT) for _ in range(repeat)]
+    return min(runs, key=lambda r: r["seconds"])
+
+
+def test_api_import_is_fast_and_light():
+    result = measure_import()
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_data_loads_in_background_with_readiness():
+    result = _run(_MEASURE_READY)
+    assert result["first"] == 503
+    assert result["firstData"] == 503 and result["retryAfter"]
+    assert result["data"] == 200
+
+
+if __name__ == "__main__":
+    imported = measure_import()
+    ready = _run(_MEASURE_READY)
+    print(f"import api: {imported['seconds'] * 1000:.1f} ms (heavy modules: {imported['loaded'] or 'none'})")
+    print(f"data ready: {ready['seconds'] * 1000:.1f} ms after import")
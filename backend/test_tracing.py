@@ -0,0 +1,47 @@
+"""
+请求链路追踪测试：每个请求写出一条 OTLP/JSON trace，各阶段 span 的父子关系、时间与属性正确
+运行: python -m pytest -q test_tracing.py
+"""
+import json
+
+import api
+import config
+import service
+import tracing
+from conftest import START_TS, make_signals, make_trading_data
+
+
+def test_request_trace_spans(loaded, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    loaded(df_data=make_trading_data(n=3000), df_signals=make_signals(n=500))
+    client = api.app.test_client()
+    client.get(f"/app/getdata?type=price&interval=1m&start={START_TS}&end={START_TS + 3000 * 60}")
+    client.get(f"/app/getresult?type=backtest&start={START_TS}&zThreshold=0.5")
+    service.get_spread_data(START_TS, START_TS + 600)       # 不在请求中：不产生 trace
+    tracing.flush()
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert len(lines) == 2
+    traces = []
+    for line in lines:
+        spans = json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert len({s["traceId"] for s in spans}) == 1
+        by_id = {s["spanId"]: s for s in spans}
+        root = next(s for s in spans if "parentSpanId" not in s)
+        assert all(s["parentSpanId"] in by_id for s in spans if s is not root)
+        assert all(int(s["startTimeUnixNano"]) <= int(s["endTimeUnixNano"]) for s in spans)
+        attrs = {s["name"]: {a["key"]: a["value"] for a in s["attributes"]} for s in spans}
+        traces.append((root, attrs, {s["name"]: by_id.get(s.get("parentSpanId"), {}).get("name") for s in spans}))
+
+    root, attrs, parents = traces[0]
+    assert root["name"] == "GET /app/getdata" and root["kind"] == tracing.KIND_SERVER
+    assert attrs[root["name"]]["http.status_code"] == {"intValue": "200"}
+    assert parents["parse_params"] == parents["cache"] == parents["serialize"] == root["name"]
+    assert parents["slice"] == parents["sample"] == "cache"
+    assert attrs["cache"]["hit"] == {"boolValue": False}
+    assert attrs["slice"]["rows"] == {"intValue": "3000"} and attrs["slice"]["table"] == {"stringValue": "rollup_60s"}
+
+    root, attrs, parents = traces[1]
+    assert root["name"] == "GET /app/getresult"
+    assert {"parse_params", "cache", "slice", "backtest", "build_rows", "serialize"} <= set(attrs)
+    assert attrs["slice"]["rows"] == {"intValue": "500"}
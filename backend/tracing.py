@@ -0,0 +1,188 @@
+"""
+请求链路追踪：记录每个请求在 api → service → DataLoader 各阶段的耗时与行数
+- 根 span 在 api.py 的 before_request 中开始，响应发送完 (流式响应为最后一块) 时结束
+- 子 span 用 `with tracing.span(name, **attrs) as s:` 记录，s.set(...) 补充行数等属性，嵌套关系由 contextvars 传递；
+  当前没有 trace 时 (后台装载、脚本或测试直接调用 service) span 为空操作
+- 结束的 trace 按 OpenTelemetry Collector file exporter 的格式 (每行一个 OTLP/JSON ExportTraceServiceRequest)
+  写入 TRACE_FILE，JSON 序列化与写文件都在后台线程中进行
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import random
+import threading
+import time
+
+import config
+import metrics
+
+SERVICE_NAME = "arbitrage-api"
+
+# OTLP 的 span kind 与状态码
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """一个阶段；作为上下文管理器使用，进入时成为当前 span，退出时记录结束时间"""
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error",
+                 "_token")
+
+    def __init__(self, trace, name, parent_id=None, kind=KIND_INTERNAL, attributes=None):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.trace.spans.append(self)
+        return False
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP = _NoopSpan()
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans = []
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}      # OTLP/JSON 中 int64 写为字符串
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def start_trace(name, **attributes):
+    """开始一个新的 trace 并把根 span 设为当前 span；TRACING 关闭时返回 None"""
+    if not config.TRACING:
+        return None
+    root = Span(Trace(), name, kind=KIND_SERVER, attributes=attributes)
+    _current.set(root)
+    return root
+
+
+def end_trace(root, **attributes):
+    """结束根 span 并导出整个 trace"""
+    if root is None:
+        return
+    root.set(**attributes)
+    root.end_ns = time.time_ns()
+    if _current.get() is root:
+        _current.set(None)
+    root.trace.spans.append(root)
+    _exporter().put(root.trace)
+
+
+def span(name, **attributes):
+    """`with span(name, **attrs) as s:` 记录当前 span 下的一个子阶段；没有 trace 时返回空操作的 NOOP"""
+    parent = _current.get()
+    if parent is None:
+        return NOOP
+    return Span(parent.trace, name, parent.span_id, attributes=attributes)
+
+
+# ==========================================
+# 导出
+# ==========================================
+class OtlpFormatter(logging.Formatter):
+    """record.msg 为 Trace，输出一行 ExportTraceServiceRequest JSON"""
+
+    def format(self, record):
+        trace = record.msg
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME),
+                                        _attribute("process.pid", os.getpid())]},
+            "scopeSpans": [{"scope": {"name": __name__},
+                            "spans": [s.to_otlp() for s in trace.spans]}],
+        }]}, separators=(",", ":"))
+
+
+_export_lock = threading.Lock()
+_export_path = None
+_writer = None
+
+
+def _exporter():
+    """
+    写出 trace 的 BatchWriter (JSON 序列化在写出线程中进行)，文件超过 TRACE_FILE_MAX_BYTES 时轮转
+    TRACE_FILE 修改后下一次导出时切换到新文件
+    """
+    global _export_path, _writer
+    if _export_path != config.TRACE_FILE:
+        with _export_lock:
+            if _export_path != config.TRACE_FILE:
+                if _writer is not None:
+                    _writer.close()
+                directory = os.path.dirname(config.TRACE_FILE)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                target = logging.handlers.RotatingFileHandler(
+                    config.TRACE_FILE, maxBytes=config.TRACE_FILE_MAX_BYTES, backupCount=3, delay=True)
+                target.setFormatter(OtlpFormatter())
+                _writer = metrics.BatchWriter(lambda trace: target.handle(logging.makeLogRecord({"msg": trace})),
+                                              target.flush, "trace-writer")
+                _export_path = config.TRACE_FILE
+    return _writer
+
+
+def flush():
+    """等待已结束的 trace 全部写入文件"""
+    if _writer is not None:
+        _writer.flush()